@@ -0,0 +1,225 @@
+"""Benchmarks for whenwords.
+
+Run from this directory:
+
+    python bench_whenwords.py            # all benchmarks
+    python bench_whenwords.py page_render
+
+Each benchmark prints the best time over several repeats.
+"""
+
+import random
+import sys
+import timeit
+
+from whenwords import Renderer, timeago, human_date, date_range, parse_iso_column
+from whenwords import timeago_many, human_date_many, timeago_runs, human_date_runs
+from whenwords import LastSeenIndex
+from whenwords import duration, _to_timestamp, _duration_counts_int, _duration_counts_float
+
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    """Register a benchmark under its name without the ``bench_`` prefix."""
+    BENCHMARKS[func.__name__[len('bench_'):]] = func
+    return func
+
+
+def best_time(func, number: int, repeat: int = 5) -> float:
+    """Best wall time, in seconds, of ``number`` calls of ``func``."""
+    return min(timeit.repeat(func, number=number, repeat=repeat))
+
+
+def report(name: str, seconds: float, items: int, baseline: float = None) -> None:
+    line = f"  {name:<32} {seconds * 1e3:9.3f} ms  {seconds / items * 1e6:8.3f} µs/item"
+    if baseline is not None:
+        line += f"  {baseline / seconds:5.2f}x"
+    print(line)
+
+
+# =============================================================================
+# Page render
+# =============================================================================
+
+PAGE_REFERENCE = 1705276800  # 2024-01-15 00:00 UTC
+PAGE_TIMEZONE = "America/New_York"
+PAGE_ITEMS = 500
+
+
+def _page_items(seed: int = 1):
+    """500 (timestamp, range end) pairs, mostly from the last few days."""
+    rng = random.Random(seed)
+    items = []
+    for _ in range(PAGE_ITEMS):
+        age = int(rng.expovariate(1 / (3 * 86400)))
+        items.append((PAGE_REFERENCE - age, PAGE_REFERENCE - age + rng.randrange(4 * 86400)))
+    return items
+
+
+@benchmark
+def bench_page_render():
+    """A typical page: timeago and human_date for 500 items, and 50 ranges."""
+    items = _page_items()
+
+    def module_functions():
+        for ts, end in items:
+            timeago(ts, PAGE_REFERENCE)
+            human_date(ts, PAGE_REFERENCE, timezone=PAGE_TIMEZONE)
+        for ts, end in items[::10]:
+            date_range(ts, end, timezone=PAGE_TIMEZONE)
+
+    def renderer():
+        page = Renderer(PAGE_REFERENCE, timezone=PAGE_TIMEZONE)
+        for ts, end in items:
+            page.timeago(ts)
+            page.human_date(ts)
+        for ts, end in items[::10]:
+            page.date_range(ts, end)
+
+    print(f"page_render ({PAGE_ITEMS} items, {PAGE_TIMEZONE})")
+    baseline = best_time(module_functions, number=20) / 20
+    report("module functions", baseline, PAGE_ITEMS)
+    report("Renderer (incl. construction)", best_time(renderer, number=20) / 20,
+           PAGE_ITEMS, baseline)
+
+
+# =============================================================================
+# ISO 8601 column ingest
+# =============================================================================
+
+@benchmark
+def bench_iso_column():
+    """100,000 ISO strings in one layout: per-value parsing vs parse_iso_column."""
+    rng = random.Random(2)
+    layouts = {
+        "Z": lambda s: s.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "+05:30": lambda s: s.strftime('%Y-%m-%dT%H:%M:%S+05:30'),
+        "millis": lambda s: s.strftime('%Y-%m-%dT%H:%M:%S.') + f"{rng.randrange(1000):03d}Z",
+    }
+    from datetime import datetime, timezone
+    stamps = [datetime.fromtimestamp(PAGE_REFERENCE - rng.randrange(30 * 86400), tz=timezone.utc)
+              for _ in range(100000)]
+    for name, fmt in layouts.items():
+        values = [fmt(s) for s in stamps]
+        print(f"iso_column ({len(values)} values, {name})")
+        baseline = best_time(lambda: [_to_timestamp(v) for v in values], number=1, repeat=3)
+        report("_to_timestamp per value", baseline, len(values))
+        report("parse_iso_column", best_time(lambda: parse_iso_column(values), number=1, repeat=3),
+               len(values), baseline)
+
+
+# =============================================================================
+# Sorted log streams
+# =============================================================================
+
+@benchmark
+def bench_sorted_stream():
+    """500,000 ascending timestamps, two per second over three days."""
+    stamps = [PAGE_REFERENCE - 3 * 86400 + i * 0.5 for i in range(500000)]
+    print(f"sorted_stream ({len(stamps)} timestamps, {PAGE_TIMEZONE})")
+    baseline = best_time(lambda: timeago_many(stamps, PAGE_REFERENCE), number=1, repeat=3)
+    report("timeago_many", baseline, len(stamps))
+    report("timeago_runs", best_time(lambda: timeago_runs(stamps, PAGE_REFERENCE),
+                                     number=1, repeat=3), len(stamps), baseline)
+    baseline = best_time(lambda: human_date_many(stamps, PAGE_REFERENCE, PAGE_TIMEZONE),
+                         number=1, repeat=3)
+    report("human_date_many", baseline, len(stamps))
+    report("human_date_runs(...).expand()",
+           best_time(lambda: human_date_runs(stamps, PAGE_REFERENCE, PAGE_TIMEZONE).expand(),
+                     number=1, repeat=3), len(stamps), baseline)
+
+
+# =============================================================================
+# Mailbox-sized human_date
+# =============================================================================
+
+@benchmark
+def bench_mailbox():
+    """1,000,000 timestamps over a year: a list vs a NumPy array (if installed)."""
+    rng = random.Random(3)
+    stamps = [PAGE_REFERENCE - rng.randrange(365 * 86400) for _ in range(1000000)]
+    print(f"mailbox ({len(stamps)} timestamps, {PAGE_TIMEZONE})")
+    baseline = best_time(lambda: human_date_many(stamps, PAGE_REFERENCE, PAGE_TIMEZONE),
+                         number=1, repeat=3)
+    report("human_date_many(list)", baseline, len(stamps))
+    try:
+        import numpy as np
+    except ImportError:
+        print("  (numpy not installed; skipping the array path)")
+        return
+    received = np.array(stamps, dtype=np.int64)
+    report("human_date_many(ndarray)",
+           best_time(lambda: human_date_many(received, PAGE_REFERENCE, PAGE_TIMEZONE),
+                     number=1, repeat=3), len(stamps), baseline)
+
+
+# =============================================================================
+# duration arithmetic
+# =============================================================================
+
+@benchmark
+def bench_duration():
+    """100,000 whole-second durations: the float path vs the integer engine."""
+    rng = random.Random(4)
+    values = [rng.randrange(10 ** rng.randrange(1, 9)) for _ in range(100000)]
+    print(f"duration ({len(values)} int values, max_units=2)")
+    baseline = best_time(lambda: [_duration_counts_float(v, 2) for v in values],
+                         number=1, repeat=5)
+    report("float path (counts)", baseline, len(values))
+    report("integer engine (counts)",
+           best_time(lambda: [_duration_counts_int(v, 2) for v in values], number=1, repeat=5),
+           len(values), baseline)
+    report("duration()", best_time(lambda: [duration(v) for v in values], number=1, repeat=5),
+           len(values))
+
+
+# =============================================================================
+# Last-seen index
+# =============================================================================
+
+@benchmark
+def bench_last_seen():
+    """2,000,000 users: bucket counts over all keys, and a 1,000-key page."""
+    import whenwords
+    rng = random.Random(5)
+    users = 2000000
+    index = LastSeenIndex()
+    for user in range(users):
+        index.update(user, PAGE_REFERENCE - int(rng.expovariate(1 / (20 * 86400))))
+    as_dict = {user: float(index.get(user)) for user in range(users)}
+    dict_bytes = sys.getsizeof(as_dict) + sum(sys.getsizeof(v) for v in as_dict.values())
+    print(f"last_seen ({users} int keys): {index._times.itemsize * len(index._times) / 1e6:.0f} MB"
+          f" in the index vs {dict_bytes / 1e6:.0f} MB as a dict of floats")
+    del as_dict
+
+    saved, whenwords.np = whenwords.np, None
+    try:
+        baseline = best_time(lambda: index.timeago_counts(PAGE_REFERENCE), number=1, repeat=3)
+    finally:
+        whenwords.np = saved
+    report("timeago_counts (pure Python)", baseline, users)
+    if saved is not None:
+        report("timeago_counts (NumPy)",
+               best_time(lambda: index.timeago_counts(PAGE_REFERENCE), number=1, repeat=3),
+               users, baseline)
+    page = rng.sample(range(users), 1000)
+    report("timeago(1,000 keys)", best_time(lambda: index.timeago(page, PAGE_REFERENCE),
+                                            number=10) / 10, len(page))
+
+
+def main(argv) -> int:
+    names = argv or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmark(s): {', '.join(unknown)}", file=sys.stderr)
+        print(f"Available: {', '.join(BENCHMARKS)}", file=sys.stderr)
+        return 2
+    for name in names:
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,256 @@
+"""Allocation budgets for whenwords.
+
+Measures with ``tracemalloc`` what each public function allocates:
+
+- peak bytes: the most memory a call holds at once beyond what was live
+  before it, temporaries included;
+- retained blocks and bytes: what is still allocated after the call, with
+  its result kept alive.
+
+Scalar functions are measured per call and batch functions per item. Every
+case has a budget for each figure, and exceeding any of them is a failure,
+so allocation regressions show up as a nonzero exit (and a failing test in
+``test_memory_whenwords.py``).
+
+Run from this directory:
+
+    python memory_whenwords.py                       # all cases
+    python memory_whenwords.py duration timeago_many
+    python memory_whenwords.py --budgets budgets.json
+    python memory_whenwords.py --json
+
+A budgets file overrides defaults per case, e.g.
+``{"duration": {"peak_bytes": 2048}}``.
+"""
+
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import whenwords
+
+
+REFERENCE = 1705312800  # 2024-01-15 10:00 UTC
+TIMEZONE = "America/New_York"
+BATCH_ITEMS = 1000
+
+
+class Budget(NamedTuple):
+    """Per-call (or per-item) allocation limits."""
+    peak_bytes: float
+    retained_bytes: float
+    retained_blocks: float
+
+
+class Case(NamedTuple):
+    name: str
+    func: Callable
+    args: tuple
+    # Items per call: 1 for scalar functions, the batch size otherwise
+    items: int
+    budget: Budget
+
+
+class Measurement(NamedTuple):
+    name: str
+    items: int
+    peak_bytes: float
+    retained_bytes: float
+    retained_blocks: float
+
+
+def _iso(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _batch_timestamps() -> List[str]:
+    """Log-like ISO timestamps over the last three days."""
+    return [_iso(REFERENCE - 3 * 86400 + i * 259) for i in range(BATCH_ITEMS)]
+
+
+def default_cases() -> List[Case]:
+    """Every public function on a representative input."""
+    stamps = _batch_timestamps()
+    numbers = [REFERENCE - 3 * 86400 + i * 259 for i in range(BATCH_ITEMS)]
+    ranges = list(zip(numbers, numbers[::-1]))
+    page = whenwords.Renderer(REFERENCE, timezone=TIMEZONE)
+    # Budgets sit about 1.5-2x above the measured figures
+    return [
+        Case('timeago', whenwords.timeago, ("2024-01-15T08:30:00Z", REFERENCE), 1,
+             Budget(peak_bytes=512, retained_bytes=16, retained_blocks=0.5)),
+        Case('timeago_numeric', whenwords.timeago, (REFERENCE - 5000, REFERENCE), 1,
+             Budget(peak_bytes=128, retained_bytes=16, retained_blocks=0.5)),
+        Case('duration', whenwords.duration, (93784,), 1,
+             Budget(peak_bytes=768, retained_bytes=128, retained_blocks=1.5)),
+        Case('duration_compact', whenwords.duration, (93784, {'compact': True}), 1,
+             Budget(peak_bytes=768, retained_bytes=128, retained_blocks=1.5)),
+        Case('parse_duration', whenwords.parse_duration, ("2 hours, 30 minutes and 5s",), 1,
+             Budget(peak_bytes=4096, retained_bytes=64, retained_blocks=1.5)),
+        Case('human_date', whenwords.human_date,
+             ("2024-01-12T08:30:00Z", REFERENCE, TIMEZONE), 1,
+             Budget(peak_bytes=8192, retained_bytes=128, retained_blocks=1.5)),
+        Case('date_range', whenwords.date_range,
+             ("2024-01-12T08:30:00Z", "2024-02-03T08:30:00Z", TIMEZONE), 1,
+             Budget(peak_bytes=8192, retained_bytes=256, retained_blocks=1.5)),
+        Case('renderer_human_date', page.human_date, ("2024-01-12T08:30:00Z",), 1,
+             Budget(peak_bytes=512, retained_bytes=16, retained_blocks=0.5)),
+        Case('timeago_many', whenwords.timeago_many, (stamps, REFERENCE), BATCH_ITEMS,
+             Budget(peak_bytes=128, retained_bytes=16, retained_blocks=0.1)),
+        Case('human_date_many', whenwords.human_date_many, (stamps, REFERENCE, TIMEZONE),
+             BATCH_ITEMS, Budget(peak_bytes=128, retained_bytes=16, retained_blocks=0.1)),
+        Case('human_date_many_encoded', whenwords.human_date_many,
+             (stamps, REFERENCE, TIMEZONE, True), BATCH_ITEMS,
+             Budget(peak_bytes=128, retained_bytes=8, retained_blocks=0.1)),
+        Case('date_range_many', whenwords.date_range_many, (ranges, TIMEZONE), BATCH_ITEMS,
+             Budget(peak_bytes=192, retained_bytes=16, retained_blocks=0.1)),
+        Case('parse_iso_column', whenwords.parse_iso_column, (stamps,), BATCH_ITEMS,
+             Budget(peak_bytes=128, retained_bytes=16, retained_blocks=0.1)),
+        Case('human_date_runs', whenwords.human_date_runs, (stamps, REFERENCE, TIMEZONE),
+             BATCH_ITEMS, Budget(peak_bytes=128, retained_bytes=4, retained_blocks=0.1)),
+    ]
+
+
+# =============================================================================
+# Measuring
+# =============================================================================
+
+def _not_tracemalloc(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    """Drop the blocks tracemalloc allocates for its own snapshots."""
+    return snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+def measure(case: Case, calls: int = 100) -> Measurement:
+    """Measure ``case`` over ``calls`` calls, after warming every cache.
+
+    Batch cases already cover many items per call, so they run a tenth as
+    many calls.
+    """
+    func, args = case.func, case.args
+    if case.items > 1:
+        calls = max(2, calls // 10)
+    for _ in range(3):
+        func(*args)
+    results: List[Any] = [None] * calls
+    gc.collect()
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        # The first filtered snapshot fills fnmatch's pattern cache
+        _not_tracemalloc(tracemalloc.take_snapshot())
+        gc.collect()
+
+        # Retained: results stay alive in the preallocated list. Objects
+        # parked on CPython's free lists by the first traced calls stay
+        # traced, so only calls after those are measured.
+        settled: List[Any] = [None] * min(calls, 10)
+        for i in range(len(settled)):
+            settled[i] = func(*args)
+        before = _not_tracemalloc(tracemalloc.take_snapshot())
+        for i in range(calls):
+            results[i] = func(*args)
+        after = _not_tracemalloc(tracemalloc.take_snapshot())
+        # Only growth counts, so unrelated frees can't hide allocations
+        stats = after.compare_to(before, 'lineno')
+        retained_bytes = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+        retained_blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+
+        # Peak: the high-water mark of each call above its starting point
+        results = [None] * calls
+        peak = 0
+        for i in range(calls):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            results[i] = func(*args)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    per = calls * case.items
+    return Measurement(case.name, case.items, peak / case.items,
+                       retained_bytes / per, retained_blocks / per)
+
+
+def violations(measurement: Measurement, budget: Budget) -> List[str]:
+    """Human-readable descriptions of every budget ``measurement`` exceeds."""
+    problems = []
+    for field in Budget._fields:
+        value, limit = getattr(measurement, field), getattr(budget, field)
+        if value > limit:
+            problems.append(f"{measurement.name}: {field} {value:.2f} exceeds budget {limit}")
+    return problems
+
+
+def load_budgets(path: str, cases: List[Case]) -> List[Case]:
+    """Apply per-case budget overrides from a JSON file."""
+    with open(path, encoding='utf-8') as f:
+        overrides: Dict[str, Dict[str, float]] = json.load(f)
+    names = {case.name for case in cases}
+    unknown = set(overrides) - names
+    if unknown:
+        raise ValueError(f"Unknown case(s) in budgets: {', '.join(sorted(unknown))}")
+    return [case._replace(budget=case.budget._replace(**overrides[case.name]))
+            if case.name in overrides else case for case in cases]
+
+
+def run(cases: List[Case], calls: int = 100) -> tuple:
+    """Measure every case; return (measurements, violations)."""
+    measurements = []
+    problems = []
+    for case in cases:
+        measurement = measure(case, calls)
+        measurements.append(measurement)
+        problems.extend(violations(measurement, case.budget))
+    return measurements, problems
+
+
+def print_report(cases: List[Case], measurements: List[Measurement]) -> None:
+    print(f"  {'case':<26}{'per':>6}{'peak B':>10}{'kept B':>10}{'kept blk':>10}"
+          f"   budget (peak / kept B / kept blk)")
+    for case, m in zip(cases, measurements):
+        per = "call" if m.items == 1 else "item"
+        budget = case.budget
+        print(f"  {m.name:<26}{per:>6}{m.peak_bytes:>10.1f}{m.retained_bytes:>10.1f}"
+              f"{m.retained_blocks:>10.2f}   {budget.peak_bytes:g} / "
+              f"{budget.retained_bytes:g} / {budget.retained_blocks:g}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('cases', nargs='*', help="cases to run (default: all)")
+    parser.add_argument('--budgets', help="JSON file of per-case budget overrides")
+    parser.add_argument('--calls', type=int, default=100, help="calls measured per case")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    cases = default_cases()
+    if args.budgets:
+        cases = load_budgets(args.budgets, cases)
+    if args.cases:
+        by_name = {case.name: case for case in cases}
+        unknown = [name for name in args.cases if name not in by_name]
+        if unknown:
+            print(f"Unknown case(s): {', '.join(unknown)}", file=sys.stderr)
+            print(f"Available: {', '.join(by_name)}", file=sys.stderr)
+            return 2
+        cases = [by_name[name] for name in args.cases]
+
+    measurements, problems = run(cases, args.calls)
+    if args.json:
+        print(json.dumps({'measurements': [m._asdict() for m in measurements],
+                          'violations': problems}, indent=2))
+    else:
+        print_report(cases, measurements)
+        for problem in problems:
+            print(f"OVER BUDGET {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
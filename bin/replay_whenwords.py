@@ -0,0 +1,316 @@
+"""Workload replay harness for whenwords.
+
+Replays a trace of calls through the public API and reports throughput,
+latency percentiles and cache hit rates. Traces are either recorded (a JSON
+lines file) or generated with realistic distributions: Zipf-distributed
+repeated timestamps, mostly ISO 8601 strings, a long tail of mixed-unit
+``parse_duration`` inputs, and many calls per reference.
+
+Trace format, one call per line:
+
+    {"fn": "timeago", "args": ["2024-01-15T08:30:00Z", 1705312800]}
+    {"fn": "duration", "args": [9000], "kwargs": {"options": {"compact": true}}}
+
+Run from this directory:
+
+    python replay_whenwords.py --trace calls.jsonl
+    python replay_whenwords.py --synthetic 100000 --zipf 1.2 --iso-share 0.8
+    python replay_whenwords.py --synthetic 100000 --save calls.jsonl
+    python replay_whenwords.py --synthetic 100000 --cache-size 4096
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import whenwords
+
+
+FUNCTIONS = {
+    'timeago': whenwords.timeago,
+    'duration': whenwords.duration,
+    'parse_duration': whenwords.parse_duration,
+    'human_date': whenwords.human_date,
+    'date_range': whenwords.date_range,
+}
+
+
+class Call(NamedTuple):
+    fn: str
+    args: list
+    kwargs: dict
+
+
+# =============================================================================
+# Traces
+# =============================================================================
+
+def read_trace(path: str) -> List[Call]:
+    """Read a JSON lines trace file."""
+    calls = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('fn') not in FUNCTIONS:
+                raise ValueError(f"Unknown function on line {line_number}: {record.get('fn')}")
+            calls.append(Call(record['fn'], record.get('args', []), record.get('kwargs', {})))
+    return calls
+
+
+def write_trace(path: str, calls: Iterable[Call]) -> None:
+    """Write calls as a JSON lines trace file."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for call in calls:
+            record: Dict[str, Any] = {'fn': call.fn, 'args': call.args}
+            if call.kwargs:
+                record['kwargs'] = call.kwargs
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class TraceConfig(NamedTuple):
+    """Distributions for synthetic traces."""
+    calls: int = 100000
+    seed: int = 0
+    # Relative weights of each function in the mix
+    mix: tuple = (('timeago', 0.5), ('human_date', 0.2), ('date_range', 0.05),
+                  ('duration', 0.1), ('parse_duration', 0.15))
+    # Pool sizes and Zipf exponent for repeated values
+    distinct_timestamps: int = 5000
+    distinct_durations: int = 2000
+    zipf: float = 1.1
+    # Share of timestamps passed as ISO 8601 strings
+    iso_share: float = 0.8
+    # Consecutive calls sharing one reference
+    calls_per_reference: int = 200
+    reference: int = 1705312800  # 2024-01-15 10:00 UTC
+    timezones: tuple = (None, "America/New_York", "Europe/London")
+
+
+def _zipf_sampler(rng: random.Random, pool: list, exponent: float):
+    """Return a function drawing from ``pool`` with Zipf weights by position."""
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(pool) + 1):
+        total += 1.0 / rank ** exponent
+        cum_weights.append(total)
+    return lambda: rng.choices(pool, cum_weights=cum_weights)[0]
+
+
+def _iso(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+_UNIT_SPELLINGS = {
+    3600: ('h', 'hr', 'hrs', 'hour', 'hours'),
+    60: ('m', 'min', 'mins', 'minute', 'minutes'),
+    1: ('s', 'sec', 'secs', 'second', 'seconds'),
+    86400: ('d', 'day', 'days'),
+    604800: ('w', 'wk', 'week', 'weeks'),
+}
+
+
+def _duration_string(rng: random.Random) -> str:
+    """A human-written duration in one of the formats parse_duration accepts."""
+    style = rng.random()
+    if style < 0.1:
+        return f"{rng.randrange(10)}:{rng.randrange(60):02d}" + (
+            f":{rng.randrange(60):02d}" if rng.random() < 0.5 else "")
+    if style < 0.2:
+        return f"{rng.randrange(1, 10)}.{rng.choice((25, 5, 75))} {rng.choice(('hours', 'h', 'days'))}"
+    units = rng.sample(sorted(_UNIT_SPELLINGS, reverse=True), rng.randint(1, 3))
+    parts = []
+    for unit in sorted(units, reverse=True):
+        spelling = rng.choice(_UNIT_SPELLINGS[unit])
+        separator = "" if len(spelling) <= 3 and rng.random() < 0.7 else " "
+        parts.append(f"{rng.randrange(1, 60)}{separator}{spelling}")
+    return rng.choice((" ", ", ", " and ", "")).join(parts)
+
+
+def generate_trace(config: TraceConfig = TraceConfig()) -> List[Call]:
+    """Generate a synthetic trace following ``config``'s distributions."""
+    rng = random.Random(config.seed)
+
+    # Timestamp pool: mostly recent, ranked by popularity
+    ages = [int(rng.expovariate(1 / (2 * 86400))) for _ in range(config.distinct_timestamps)]
+    next_timestamp = _zipf_sampler(rng, ages, config.zipf)
+    next_seconds = _zipf_sampler(
+        rng, [int(rng.expovariate(1 / 3600)) for _ in range(config.distinct_durations)],
+        config.zipf)
+    next_duration_string = _zipf_sampler(
+        rng, [_duration_string(rng) for _ in range(config.distinct_durations)], config.zipf)
+
+    names = [name for name, _ in config.mix]
+    weights = [weight for _, weight in config.mix]
+    functions = rng.choices(names, weights=weights, k=config.calls)
+
+    reference = config.reference
+    timezone = config.timezones[0]
+    calls = []
+    for index, fn in enumerate(functions):
+        if index and index % config.calls_per_reference == 0:
+            reference += rng.randrange(1, 120)
+            timezone = rng.choice(config.timezones)
+
+        def stamp():
+            seconds = reference - next_timestamp()
+            return _iso(seconds) if rng.random() < config.iso_share else seconds
+
+        if fn == 'timeago':
+            calls.append(Call(fn, [stamp(), reference], {}))
+        elif fn == 'human_date':
+            calls.append(Call(fn, [stamp(), reference], {'timezone': timezone} if timezone else {}))
+        elif fn == 'date_range':
+            calls.append(Call(fn, [stamp(), stamp()], {'timezone': timezone} if timezone else {}))
+        elif fn == 'duration':
+            options = {'compact': True} if rng.random() < 0.5 else {}
+            calls.append(Call(fn, [next_seconds()], {'options': options} if options else {}))
+        else:
+            calls.append(Call(fn, [next_duration_string()], {}))
+    return calls
+
+
+# =============================================================================
+# Replay
+# =============================================================================
+
+class FunctionStats(NamedTuple):
+    calls: int
+    errors: int
+    seconds: float
+    p50_us: float
+    p90_us: float
+    p99_us: float
+    max_us: float
+
+
+def _percentile(sorted_values: List[int], fraction: float) -> int:
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counters of every enabled result cache, and the offset tables."""
+    stats = {}
+    for name, info in whenwords.cache_info().items():
+        stats[name] = {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}
+    stats['offset_tables'] = {'zones': len(whenwords._OFFSET_TABLES)}
+    return stats
+
+
+def replay(calls: List[Call]) -> Dict[str, Any]:
+    """Replay ``calls`` through the public API and collect timings."""
+    latencies: Dict[str, List[int]] = {name: [] for name in FUNCTIONS}
+    errors = dict.fromkeys(FUNCTIONS, 0)
+    clock = time.perf_counter_ns
+    started = clock()
+    for fn, args, kwargs in calls:
+        func = FUNCTIONS[fn]
+        before = clock()
+        try:
+            func(*args, **kwargs)
+        except ValueError:
+            errors[fn] += 1
+        latencies[fn].append(clock() - before)
+    elapsed = (clock() - started) / 1e9
+
+    per_function = {}
+    for name, values in latencies.items():
+        if not values:
+            continue
+        values.sort()
+        per_function[name] = FunctionStats(
+            calls=len(values), errors=errors[name], seconds=sum(values) / 1e9,
+            p50_us=_percentile(values, 0.5) / 1e3, p90_us=_percentile(values, 0.9) / 1e3,
+            p99_us=_percentile(values, 0.99) / 1e3, max_us=values[-1] / 1e3)
+    all_values = sorted(v for values in latencies.values() for v in values)
+    return {
+        'calls': len(calls),
+        'seconds': elapsed,
+        'calls_per_second': len(calls) / elapsed if elapsed else 0.0,
+        'p50_us': _percentile(all_values, 0.5) / 1e3,
+        'p90_us': _percentile(all_values, 0.9) / 1e3,
+        'p99_us': _percentile(all_values, 0.99) / 1e3,
+        'functions': {name: stats._asdict() for name, stats in per_function.items()},
+        'caches': cache_stats(),
+    }
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"{result['calls']} calls in {result['seconds']:.3f} s "
+          f"({result['calls_per_second']:,.0f} calls/s)")
+    print(f"latency µs: p50 {result['p50_us']:.2f}  p90 {result['p90_us']:.2f}  "
+          f"p99 {result['p99_us']:.2f}")
+    print()
+    print(f"  {'function':<16}{'calls':>9}{'errors':>8}{'p50 µs':>9}{'p90 µs':>9}"
+          f"{'p99 µs':>9}{'max µs':>10}")
+    for name, stats in result['functions'].items():
+        print(f"  {name:<16}{stats['calls']:>9}{stats['errors']:>8}{stats['p50_us']:>9.2f}"
+              f"{stats['p90_us']:>9.2f}{stats['p99_us']:>9.2f}{stats['max_us']:>10.1f}")
+    print()
+    print("caches:")
+    for name, stats in result['caches'].items():
+        if 'hits' in stats:
+            lookups = stats['hits'] + stats['misses']
+            rate = stats['hits'] / lookups if lookups else 0.0
+            print(f"  {name:<24} {stats['hits']} hits, {stats['misses']} misses ({rate:.1%}), "
+                  f"{stats['size']} entries")
+        else:
+            print(f"  {name:<24} " + ", ".join(f"{v} {k}" for k, v in stats.items()))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--trace', help="JSON lines trace file to replay")
+    source.add_argument('--synthetic', type=int, metavar='CALLS',
+                        help="generate a synthetic trace with this many calls")
+    defaults = TraceConfig()
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--zipf', type=float, default=defaults.zipf,
+                        help="Zipf exponent for repeated values")
+    parser.add_argument('--iso-share', type=float, default=defaults.iso_share,
+                        help="share of timestamps given as ISO 8601 strings")
+    parser.add_argument('--distinct-timestamps', type=int, default=defaults.distinct_timestamps)
+    parser.add_argument('--distinct-durations', type=int, default=defaults.distinct_durations)
+    parser.add_argument('--calls-per-reference', type=int, default=defaults.calls_per_reference)
+    parser.add_argument('--cache-size', type=int, metavar='N',
+                        help="enable whenwords result caching with N entries per function")
+    parser.add_argument('--cache-ttl', type=float, metavar='SECONDS',
+                        help="expire cached results after this many seconds")
+    parser.add_argument('--save', help="write the generated trace to this file")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        calls = read_trace(args.trace)
+    else:
+        calls = generate_trace(defaults._replace(
+            calls=args.synthetic, seed=args.seed, zipf=args.zipf, iso_share=args.iso_share,
+            distinct_timestamps=args.distinct_timestamps,
+            distinct_durations=args.distinct_durations,
+            calls_per_reference=args.calls_per_reference))
+        if args.save:
+            write_trace(args.save, calls)
+
+    if args.cache_size or args.cache_ttl:
+        whenwords.enable_cache(maxsize=args.cache_size or 4096, ttl=args.cache_ttl)
+    try:
+        result = replay(calls)
+    finally:
+        whenwords.disable_cache()
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Allocation budgets for whenwords, and tests for the measuring harness"""
+
+import json
+
+import pytest
+
+from memory_whenwords import (
+    Budget, Case, default_cases, measure, violations, load_budgets, run, main,
+)
+
+
+def test_default_budgets_hold():
+    measurements, problems = run(default_cases(), calls=20)
+    assert problems == []
+    assert {m.name for m in measurements} >= {
+        'timeago', 'duration', 'parse_duration', 'human_date', 'date_range'}
+
+
+def test_measure_counts_retained_and_peak_allocations():
+    kept = []
+
+    def leaky():
+        kept.append(bytearray(1000))
+        return bytes(5000)[:0]
+
+    m = measure(Case('leaky', leaky, (), 1, Budget(0, 0, 0)), calls=10)
+    # A bytearray is two blocks: the object and its buffer
+    assert 1000 <= m.retained_bytes < 1200
+    assert 2 <= m.retained_blocks < 3
+    assert m.peak_bytes >= 5000
+    assert len(violations(m, Budget(0, 0, 0))) == 3
+    assert violations(m, Budget(10000, 10000, 10)) == []
+
+
+def test_measure_reports_batch_figures_per_item():
+    m = measure(Case('batch', lambda n: [bytearray(100) for _ in range(n)], (50,), 50,
+                     Budget(0, 0, 0)), calls=5)
+    assert m.items == 50
+    assert 100 <= m.retained_bytes < 200
+    assert 2 <= m.retained_blocks < 2.5
+
+
+def test_load_budgets_overrides(tmp_path):
+    path = tmp_path / "budgets.json"
+    path.write_text(json.dumps({"duration": {"peak_bytes": 1}}))
+    cases = {case.name: case for case in load_budgets(str(path), default_cases())}
+    assert cases['duration'].budget.peak_bytes == 1
+    assert cases['duration'].budget.retained_blocks == default_cases()[2].budget.retained_blocks
+
+    path.write_text(json.dumps({"no_such_case": {"peak_bytes": 1}}))
+    with pytest.raises(ValueError, match="no_such_case"):
+        load_budgets(str(path), default_cases())
+
+
+def test_main_fails_over_budget(tmp_path, capsys):
+    path = tmp_path / "budgets.json"
+    path.write_text(json.dumps({"duration": {"peak_bytes": 1}}))
+    assert main(["duration", "--calls", "5", "--budgets", str(path)]) == 1
+    assert "OVER BUDGET duration: peak_bytes" in capsys.readouterr().err
+
+    assert main(["duration", "--calls", "5", "--json"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report['violations'] == []
+    assert report['measurements'][0]['name'] == 'duration'
+
+    assert main(["nope"]) == 2
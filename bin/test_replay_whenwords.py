@@ -0,0 +1,70 @@
+"""Tests for the workload replay harness"""
+
+import json
+
+from replay_whenwords import (
+    Call, TraceConfig, generate_trace, read_trace, write_trace, replay, main,
+)
+
+
+SMALL = TraceConfig(calls=2000, distinct_timestamps=50, distinct_durations=50)
+
+
+def test_generate_trace_is_deterministic():
+    assert generate_trace(SMALL) == generate_trace(SMALL)
+    assert generate_trace(SMALL) != generate_trace(SMALL._replace(seed=1))
+
+
+def test_generate_trace_follows_distributions():
+    calls = generate_trace(SMALL)
+    assert len(calls) == 2000
+    assert {call.fn for call in calls} == {
+        'timeago', 'human_date', 'date_range', 'duration', 'parse_duration'}
+
+    stamps = [call.args[0] for call in calls if call.fn == 'timeago']
+    iso_share = sum(isinstance(s, str) for s in stamps) / len(stamps)
+    assert 0.7 < iso_share < 0.9
+
+    # Zipf: the most popular timestamp repeats far more than average
+    ages = [call.args[1] - call.args[0] for call in calls
+            if call.fn == 'timeago' and isinstance(call.args[0], int)]
+    assert max(ages.count(a) for a in set(ages)) > 5 * len(ages) / len(set(ages))
+
+
+def test_synthetic_trace_replays_without_errors():
+    result = replay(generate_trace(SMALL))
+    assert result['calls'] == 2000
+    assert all(stats['errors'] == 0 for stats in result['functions'].values())
+    assert result['p50_us'] <= result['p90_us'] <= result['p99_us']
+
+
+def test_trace_file_round_trip(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    calls = [Call('timeago', ["2024-01-15T08:30:00Z", 1705312800], {}),
+             Call('duration', [9000], {'options': {'compact': True}}),
+             Call('parse_duration', ["soon"], {})]
+    write_trace(str(path), calls)
+    assert read_trace(str(path)) == calls
+
+    result = replay(read_trace(str(path)))
+    assert result['functions']['parse_duration']['errors'] == 1
+
+
+def test_main_json_report(tmp_path, capsys):
+    path = tmp_path / "trace.jsonl"
+    assert main(['--synthetic', '500', '--save', str(path), '--json']) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report['calls'] == 500
+    assert len(read_trace(str(path))) == 500
+
+
+def test_main_reports_result_caches(capsys):
+    import whenwords
+    assert main(['--synthetic', '2000', '--cache-size', '256', '--json']) == 0
+    report = json.loads(capsys.readouterr().out)
+    caches = report['caches']
+    assert set(caches) >= {'timeago', 'duration', 'parse_duration', 'human_date', 'date_range'}
+    assert caches['timeago']['hits'] > caches['timeago']['misses']
+    assert all(stats['size'] <= 256 for name, stats in caches.items() if 'size' in stats)
+    # Caching is switched off again after the replay
+    assert whenwords.cache_info() == {}
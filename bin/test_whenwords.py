@@ -1,7 +1,30 @@
 """Generated tests for whenwords library from tests.yaml"""
 
 import pytest
+from array import array
+from itertools import groupby
 from whenwords import timeago, duration, parse_duration, human_date, date_range
+from whenwords import (
+    EncodedLabels, encode_labels, timeago_many, human_date_many, date_range_many,
+)
+from whenwords import enrich
+from whenwords import (
+    TIMEAGO_UNITS, HUMAN_DATE_KINDS, DATE_RANGE_LAYOUTS,
+    TimeagoParts, DurationParts, HumanDateParts, DateRangeParts,
+    timeago_parts, duration_parts, human_date_parts, date_range_parts,
+    timeago_parts_many, duration_parts_many, human_date_parts_many,
+    date_range_parts_many,
+)
+from whenwords import Renderer
+from whenwords import parse_iso_column
+from whenwords import LabelRuns, timeago_runs, human_date_runs
+from whenwords import enable_cache, disable_cache, cache_info, cache_clear
+from whenwords import export_rules, load_rules, RuleTable
+from whenwords import coalesce_date_ranges
+from whenwords import save_snapshot, load_snapshot, warm_start
+from whenwords import Session, sessionize
+from whenwords import LastSeenIndex
+from whenwords import _offset_table, _to_timestamp
 
 
 # =============================================================================
@@ -322,6 +345,41 @@ def test_duration_error_negative_seconds():
         duration(-100)
 
 
+def _duration_test_values():
+    """Unit boundaries and half-units (±1 s), plus random values up to 2**53."""
+    import random
+    from whenwords import _DURATION_UNITS
+    values = {0, 1, 2, 2 ** 53 - 1}
+    for _, _, unit in _DURATION_UNITS:
+        for k in range(1, 40):
+            for edge in (unit * k, unit * k + unit // 2):
+                values.update((edge - 1, edge, edge + 1))
+    rng = random.Random(41)
+    values.update(rng.randrange(10 ** rng.randrange(1, 16)) for _ in range(3000))
+    values.update(rng.randrange(2 ** 53) for _ in range(500))
+    return sorted(values)
+
+
+def test_duration_integer_engine_matches_float_path():
+    from whenwords import _duration_counts_int, _duration_counts_float
+    for seconds in _duration_test_values():
+        for max_units in (1, 2, 3, 6):
+            expected = _duration_counts_float(seconds, max_units)
+            assert _duration_counts_int(seconds, max_units) == expected, (seconds, max_units)
+            assert _duration_counts_float(float(seconds), max_units) == expected
+
+
+def test_duration_uses_integer_engine_for_whole_seconds():
+    year, month, day = 365 * 86400, 30 * 86400, 86400
+    # Beyond 2**53 the float path loses the trailing years
+    seconds = (10 ** 17 + 3) * year + month + 16 * day
+    assert duration(seconds) == "100000000000000003 years, 2 months"
+    assert duration(seconds, {'max_units': 1, 'compact': True}) == "100000000000000003y"
+    # Whole floats take the same path as ints; fractions still work
+    assert duration(3661.0) == duration(3661) == "1 hour, 1 minute"
+    assert duration(89.5) == "1 minute, 30 seconds"
+
+
 # =============================================================================
 # parse_duration tests
 # =============================================================================
@@ -717,3 +775,1203 @@ def test_date_range_dst_fall_back_range_spans_transition():
 def test_date_range_dst_spring_forward_utc_comparison():
     result = date_range(1774738800, 1774749600)
     assert result == "March 28–29, 2026"
+
+
+# =============================================================================
+# Batch and dictionary-encoded results
+# =============================================================================
+
+REFERENCE = 1704067200
+TIMEAGO_SAMPLES = [1704067170, 1704067155, 1704049200, 1703462400, 1700092800,
+                   1546300800, 1704067260, 1735689600, 1704049200, 1704067170]
+HUMAN_DATE_SAMPLES = [1705276800, 1705190400, 1705363200, 1705104000,
+                      1705449600, 1709251200, 1672531200, 1705190400]
+
+
+def test_timeago_many_matches_scalar():
+    result = timeago_many(TIMEAGO_SAMPLES, REFERENCE)
+    assert result == [timeago(t, REFERENCE) for t in TIMEAGO_SAMPLES]
+
+
+def test_timeago_many_accepts_mixed_types():
+    result = timeago_many(["2024-01-01T00:00:00Z", 1704049200], REFERENCE)
+    assert result == ["just now", "5 hours ago"]
+
+
+def test_timeago_many_without_reference_is_just_now():
+    assert timeago_many([1, 2]) == ["just now", "just now"]
+
+
+def test_timeago_many_encoded_round_trips():
+    result = timeago_many(TIMEAGO_SAMPLES, REFERENCE, encoded=True)
+    assert isinstance(result, EncodedLabels)
+    assert result.decode() == [timeago(t, REFERENCE) for t in TIMEAGO_SAMPLES]
+    assert len(result.labels) == len(set(result.labels)) == 8
+    assert result.codes[2] == result.codes[8]
+
+
+def test_human_date_many_matches_scalar():
+    result = human_date_many(HUMAN_DATE_SAMPLES, 1705276800)
+    assert result == [human_date(t, 1705276800) for t in HUMAN_DATE_SAMPLES]
+
+
+def test_human_date_many_encoded_with_timezone():
+    samples = [1774744200, 1774747800, 1792891800, 1792895400]
+    result = human_date_many(samples, 1774747800, timezone="Europe/London",
+                             encoded=True)
+    expected = [human_date(t, 1774747800, timezone="Europe/London")
+                for t in samples]
+    assert list(result) == expected
+
+
+def test_human_date_many_invalid_timezone():
+    with pytest.raises(ValueError):
+        human_date_many([1705276800], 1705276800, timezone="Not/AZone")
+
+
+def test_encode_labels_scalar_loop():
+    encoded = encode_labels(timeago(t, REFERENCE) for t in TIMEAGO_SAMPLES)
+    assert encoded == timeago_many(TIMEAGO_SAMPLES, REFERENCE, encoded=True)
+    assert encoded[0] == "just now"
+    assert len(encoded) == len(TIMEAGO_SAMPLES)
+
+
+# =============================================================================
+# UTC-offset transition tables
+# =============================================================================
+
+# (zone, Unix time of a transition): gaps then overlaps
+DST_TRANSITIONS = [
+    ("America/New_York", 1710054000),     # 2024-03-10 02:00 EST -> 03:00 EDT
+    ("America/New_York", 1730613600),     # 2024-11-03 02:00 EDT -> 01:00 EST
+    ("Europe/London", 1711846800),        # 2024-03-31 01:00 GMT -> 02:00 BST
+    ("Europe/London", 1729990800),        # 2024-10-27 02:00 BST -> 01:00 GMT
+    ("Australia/Lord_Howe", 1728142200),  # 2024-10-06 02:00 -> 02:30 (+10:30 -> +11)
+    ("Australia/Lord_Howe", 1712415600),  # 2024-04-07 02:00 -> 01:30 (+11 -> +10:30)
+]
+
+
+def _around(transition, step=900, days=2):
+    return list(range(transition - days * 86400, transition + days * 86400, step))
+
+
+@pytest.mark.parametrize("zone,transition", DST_TRANSITIONS)
+def test_offset_table_finds_exact_transition(zone, transition):
+    table = _offset_table(zone, transition - 86400, transition + 86400)
+    assert transition in table.starts
+    assert table.offset_at(transition - 1) != table.offset_at(transition)
+
+
+@pytest.mark.parametrize("zone,transition", DST_TRANSITIONS)
+def test_human_date_many_matches_scalar_across_dst(zone, transition):
+    samples = _around(transition)
+    for reference in (transition - 3600, transition, transition + 3600):
+        expected = [human_date(t, reference, timezone=zone) for t in samples]
+        assert human_date_many(samples, reference, timezone=zone) == expected
+
+
+@pytest.mark.parametrize("zone,transition", DST_TRANSITIONS)
+def test_date_range_many_matches_scalar_across_dst(zone, transition):
+    samples = _around(transition, step=1800)
+    pairs = [(t, t + 5400) for t in samples] + [(t + 90000, t) for t in samples]
+    expected = [date_range(s, e, timezone=zone) for s, e in pairs]
+    assert date_range_many(pairs, timezone=zone) == expected
+
+
+def test_human_date_many_fractional_timestamps_near_midnight():
+    samples = [1705276799.9999996, 1705276799.4, 1705276800.0000004, -0.5]
+    expected = [human_date(t, 1705276800) for t in samples]
+    assert human_date_many(samples, 1705276800) == expected
+
+
+def test_date_range_many_empty_and_invalid_timezone():
+    assert date_range_many([]) == []
+    with pytest.raises(ValueError):
+        date_range_many([], timezone="Not/AZone")
+
+
+def test_batches_stay_fast_with_outlying_timestamps(monkeypatch):
+    import time
+    import whenwords
+    monkeypatch.setattr(whenwords, '_OFFSET_TABLES', {})
+    jan15 = 1705276800
+    far_future, year_one = 253402000000, -62135510400
+    # Around local midnight in 1950 and 2090, outside the table's window
+    edges = [t + d for t in (-631152000, 3786912000) for d in (-18001, -18000, 0)]
+    stamps = [jan15, far_future, year_one, jan15 - 86400] + edges
+
+    started = time.perf_counter()
+    for zone in ("America/New_York", "Europe/London"):
+        assert human_date_many(stamps, jan15, zone) == \
+            [human_date(t, jan15, timezone=zone) for t in stamps]
+        pairs = [(jan15, far_future), (year_one, jan15)] + [(t, t + 7200) for t in edges]
+        assert date_range_many(pairs, zone) == [date_range(s, e, timezone=zone) for s, e in pairs]
+        assert coalesce_date_ranges(pairs[:1], zone) == [date_range(jan15, far_future, zone)]
+        assert human_date_runs(sorted(stamps), jan15, zone).expand() == \
+            [human_date(t, jan15, timezone=zone) for t in sorted(stamps)]
+    assert time.perf_counter() - started < 1.0
+    assert all(table.hi - table.lo <= whenwords._OFFSET_MAX_SPAN
+               for table in whenwords._OFFSET_TABLES.values())
+
+
+@pytest.mark.parametrize("zone", ["UTC", "Etc/GMT+5", "Etc/UTC"])
+def test_fixed_offset_zones_need_one_interval(zone):
+    stamps = [-62135510400, 0, 1705276800, 253402000000]
+    assert human_date_many(stamps, 1705276800, zone) == \
+        [human_date(t, 1705276800, timezone=zone) for t in stamps]
+    assert len(_offset_table(zone, stamps[0], stamps[-1]).starts) == 1
+
+
+# =============================================================================
+# Table-driven timeago
+# =============================================================================
+
+def _reference_timeago(diff):
+    """The original if/elif ladder, kept to check the table-driven version."""
+    abs_diff = abs(diff)
+    if abs_diff < 45:
+        return "just now"
+    elif abs_diff < 90:
+        unit, n = "minute", 1
+    elif abs_diff < 45 * 60:
+        unit, n = "minutes", round(abs_diff / 60)
+    elif abs_diff < 90 * 60:
+        unit, n = "hour", 1
+    elif abs_diff < 22 * 3600:
+        unit, n = "hours", round(abs_diff / 3600)
+    elif abs_diff < 36 * 3600:
+        unit, n = "day", 1
+    elif abs_diff < 26 * 86400:
+        unit, n = "days", round(abs_diff / 86400)
+    elif abs_diff < 46 * 86400:
+        unit, n = "month", 1
+    elif abs_diff < 320 * 86400:
+        unit, n = "months", round(abs_diff / (30 * 86400))
+    elif abs_diff < 548 * 86400:
+        unit, n = "year", 1
+    else:
+        unit, n = "years", round(abs_diff / (365 * 86400))
+    if n == 1 and unit[-1] == 's':
+        unit = unit[:-1]
+    return f"in {n} {unit}" if diff < 0 else f"{n} {unit} ago"
+
+
+TIMEAGO_BOUNDARIES = [45, 90, 45 * 60, 90 * 60, 22 * 3600, 36 * 3600,
+                      26 * 86400, 46 * 86400, 320 * 86400, 548 * 86400]
+
+
+def test_timeago_table_matches_ladder_at_boundaries():
+    diffs = []
+    for bound in TIMEAGO_BOUNDARIES:
+        diffs += [bound - 1, bound - 0.5, bound - 1e-9, bound, bound + 0.5]
+    for diff in diffs + [-d for d in diffs]:
+        assert timeago(0, diff) == _reference_timeago(diff), diff
+
+
+def test_timeago_table_matches_ladder_at_rounding_halves():
+    for divisor in (60, 3600, 86400, 30 * 86400, 365 * 86400):
+        for n in range(1, 120):
+            for diff in ((n + 0.5) * divisor, (n + 0.5) * divisor - 1):
+                assert timeago(0, diff) == _reference_timeago(diff)
+                assert timeago(diff, 0) == _reference_timeago(-diff)
+
+
+def test_timeago_table_matches_ladder_sweep():
+    diff = 1.0
+    while diff < 500 * 365 * 86400:
+        assert timeago(0, diff) == _reference_timeago(diff)
+        assert timeago(diff, 0) == _reference_timeago(-diff)
+        diff *= 1.01
+
+
+def test_timeago_results_are_shared_strings():
+    assert timeago(1704049200, 1704067200) is timeago(1704049300, 1704067300)
+    assert timeago(1704070200, 1704067200) is timeago(1704070260, 1704067260)
+
+
+def test_timeago_beyond_precomputed_years():
+    assert timeago(0, 150 * 365 * 86400) == "150 years ago"
+    assert timeago(150 * 365 * 86400, 0) == "in 150 years"
+
+
+# =============================================================================
+# Streaming record enrichment
+# =============================================================================
+
+ENRICH_FIELDS = {
+    'age': ('ts', 'timeago'),
+    'day': ('ts', human_date),
+    'took': ('elapsed', 'duration', {'compact': True}),
+    'ttl_seconds': ('ttl', parse_duration),
+}
+
+
+def test_enrich_dict_records():
+    records = [{'ts': 1704049200, 'elapsed': 125, 'ttl': '2h 30m'},
+               {'ts': 1703894400, 'elapsed': 3661, 'ttl': '90m'}]
+    result = list(enrich(records, ENRICH_FIELDS, reference=1704067200))
+    assert result == [
+        {'ts': 1704049200, 'elapsed': 125, 'ttl': '2h 30m',
+         'age': '5 hours ago', 'day': 'Yesterday',
+         'took': '2m 5s', 'ttl_seconds': 9000},
+        {'ts': 1703894400, 'elapsed': 3661, 'ttl': '90m',
+         'age': '2 days ago', 'day': 'Last Saturday',
+         'took': '1h 1m', 'ttl_seconds': 5400},
+    ]
+
+
+def test_enrich_json_lines_round_trip():
+    lines = ['{"ts": "2024-01-01T00:00:00Z", "elapsed": 90}\n', '\n',
+             b'{"ts": 1705276800}']
+    result = list(enrich(lines, ENRICH_FIELDS, reference=1704067200,
+                         timezone="America/New_York"))
+    assert result == [
+        '{"ts": "2024-01-01T00:00:00Z", "elapsed": 90, "age": "just now", '
+        '"day": "Today", "took": "1m 30s"}\n',
+        '{"ts": 1705276800, "age": "in 14 days", "day": "January 14, 2024"}',
+    ]
+
+
+def test_enrich_matches_scalar_across_batches():
+    records = [{'ts': 1704067200 - i * 977} for i in range(250)]
+    result = list(enrich(records, {'age': ('ts', timeago)},
+                         reference=1704067200, batch_size=16))
+    assert [r['age'] for r in result] == [
+        timeago(1704067200 - i * 977, 1704067200) for i in range(250)]
+
+
+def test_enrich_is_lazy():
+    def stream():
+        yield {'elapsed': 1}
+        raise AssertionError("read past the first batch")
+
+    pipeline = enrich(stream(), {'took': ('elapsed', duration)}, batch_size=1)
+    assert next(pipeline) == {'elapsed': 1, 'took': '1 second'}
+
+
+def test_enrich_errors_raise_or_null():
+    records = [{'ttl': '5m'}, {'ttl': 'soon'}, {'ttl': None}, {}]
+    with pytest.raises(ValueError):
+        list(enrich([dict(r) for r in records], {'s': ('ttl', 'parse_duration')}))
+    result = list(enrich(records, {'s': ('ttl', 'parse_duration')}, errors='null'))
+    assert result == [{'ttl': '5m', 's': 300}, {'ttl': 'soon', 's': None},
+                      {'ttl': None}, {}]
+
+
+def test_enrich_null_mode_survives_wrong_types_and_records():
+    fields = {'took': ('elapsed', 'duration'), 's': ('ttl', 'parse_duration'),
+              'when': ('ts', 'human_date')}
+    records = [{'elapsed': '125'}, {'ttl': 9000}, {'ts': [1, 2]}, {'elapsed': 60},
+               '[1,2]', b'not json\n', 7, b'\xff{"ts":1}\n', '{"ttl": "2h"}\n']
+    result = list(enrich(records, fields, reference=1704067200, errors='null'))
+    assert result == [{'elapsed': '125', 'took': None}, {'ttl': 9000, 's': None},
+                      {'ts': [1, 2], 'when': None}, {'elapsed': 60, 'took': '1 minute'},
+                      '[1,2]', b'not json\n', 7, b'\xff{"ts":1}\n',
+                      '{"ttl": "2h", "s": 7200}\n']
+
+    with pytest.raises(TypeError):
+        list(enrich([{'elapsed': '125'}], fields))
+    with pytest.raises(AttributeError):
+        list(enrich([{'ttl': 9000}], fields))
+    for record in ('[1,2]', b'not json', 7, b'\xff{"ts":1}\n'):
+        with pytest.raises(ValueError, match="not a JSON object"):
+            list(enrich([record], fields))
+
+
+def test_enrich_rejects_unknown_function():
+    with pytest.raises(ValueError):
+        list(enrich([{'ts': 1}], {'x': ('ts', date_range)}))
+
+
+# =============================================================================
+# Structured results
+# =============================================================================
+
+def _render_timeago_parts(parts):
+    if parts.unit == 'now':
+        return "just now"
+    unit = parts.unit if parts.n == 1 else parts.unit + "s"
+    return f"in {parts.n} {unit}" if parts.is_future else f"{parts.n} {unit} ago"
+
+
+def test_timeago_parts_examples():
+    assert timeago_parts(1704049200, 1704067200) == TimeagoParts(5, 'hour', False)
+    assert timeago_parts(1735689600, 1704067200) == TimeagoParts(1, 'year', True)
+    assert timeago_parts(1704067170, 1704067200) == TimeagoParts(0, 'now', False)
+
+
+def test_timeago_parts_render_to_timeago():
+    for t in TIMEAGO_SAMPLES + [1704067200 + d for d in (50, 4000, 90000, 9e6)]:
+        assert _render_timeago_parts(timeago_parts(t, REFERENCE)) == timeago(t, REFERENCE)
+
+
+def test_timeago_parts_many_columns():
+    columns = timeago_parts_many(TIMEAGO_SAMPLES, REFERENCE)
+    rows = [TimeagoParts(n, TIMEAGO_UNITS[u], bool(f))
+            for n, u, f in zip(columns.n, columns.unit, columns.is_future)]
+    assert rows == [timeago_parts(t, REFERENCE) for t in TIMEAGO_SAMPLES]
+
+
+def test_duration_parts_examples():
+    assert duration_parts(93661, {'max_units': 3}) == DurationParts(0, 0, 1, 2, 1, 0)
+    assert duration_parts(36720000) == DurationParts(1, 2, 0, 0, 0, 0)
+    assert duration_parts(3690, {'max_units': 1}) == DurationParts(0, 0, 0, 1, 0, 0)
+    assert duration_parts(0) == DurationParts(0, 0, 0, 0, 0, 0)
+
+
+def test_duration_parts_share_default_max_units(monkeypatch):
+    import whenwords
+    monkeypatch.setattr(whenwords, '_DURATION_MAX_UNITS', 3)
+    assert duration(93661) == "1 day, 2 hours, 1 minute"
+    assert duration_parts(93661) == DurationParts(0, 0, 1, 2, 1, 0)
+
+
+def test_duration_parts_error_negative_seconds():
+    with pytest.raises(ValueError):
+        duration_parts(-100)
+
+
+def test_duration_parts_many_columns():
+    values = [0, 45, 90, 3661, 9000, 93600, 36720000]
+    columns = duration_parts_many(values)
+    assert [DurationParts(*row) for row in zip(*columns)] == [
+        duration_parts(v) for v in values]
+
+
+def test_human_date_parts_examples():
+    assert human_date_parts(1705190400, 1705276800) == HumanDateParts(
+        -1, 'yesterday', 2024, 1, 14, 6)
+    assert human_date_parts(1672531200, 1705276800).kind == 'month_day_year'
+    assert human_date_parts(1705449600, 1705276800).kind == 'this_weekday'
+
+
+def test_human_date_parts_many_matches_scalar():
+    columns = human_date_parts_many(HUMAN_DATE_SAMPLES, 1705276800,
+                                    timezone="America/New_York")
+    rows = [HumanDateParts(d, HUMAN_DATE_KINDS[k], y, m, day, w)
+            for d, k, y, m, day, w in zip(*columns)]
+    assert rows == [human_date_parts(t, 1705276800, timezone="America/New_York")
+                    for t in HUMAN_DATE_SAMPLES]
+
+
+def test_date_range_parts_examples():
+    assert date_range_parts(1705881600, 1705276800) == DateRangeParts(
+        'same_month', 2024, 1, 15, 2024, 1, 22)
+    assert date_range_parts(1703721600, 1705276800).layout == 'different_years'
+
+
+def test_date_range_parts_many_matches_scalar():
+    pairs = [(1705276800, 1705276800), (1705276800, 1707955200),
+             (1703721600, 1705276800), (1721955600, 1721950200)]
+    columns = date_range_parts_many(pairs, timezone="Europe/London")
+    rows = [DateRangeParts(DATE_RANGE_LAYOUTS[row[0]], *row[1:]) for row in zip(*columns)]
+    assert rows == [date_range_parts(s, e, timezone="Europe/London") for s, e in pairs]
+
+
+# =============================================================================
+# Reference-bound rendering
+# =============================================================================
+
+@pytest.mark.parametrize("zone,transition", DST_TRANSITIONS)
+def test_renderer_matches_module_functions_across_dst(zone, transition):
+    samples = _around(transition, step=1800, days=9) + [transition - 400 * 86400,
+                                                       transition + 40 * 86400]
+    for reference in (transition - 5 * 86400, transition, transition + 3 * 86400):
+        page = Renderer(reference, timezone=zone)
+        for t in samples:
+            assert page.human_date(t) == human_date(t, reference, timezone=zone)
+            assert page.timeago(t) == timeago(t, reference)
+            assert page.date_range(t, transition) == date_range(t, transition, timezone=zone)
+
+
+def test_renderer_fall_back_across_midnight():
+    # Goose Bay fell back at 00:01 to 23:01 the previous day (2001-10-28)
+    transition = 1004238060
+    zone = "America/Goose_Bay"
+    page = Renderer(transition, timezone=zone)
+    assert page._midnights is None
+    for t in _around(transition, step=600):
+        assert page.human_date(t) == human_date(t, transition, timezone=zone)
+    assert human_date_many(_around(transition), transition, timezone=zone) == [
+        human_date(t, transition, timezone=zone) for t in _around(transition)]
+
+
+def test_renderer_precomputes_reference():
+    page = Renderer("2024-01-15T00:00:00Z", timezone="Europe/London")
+    assert page.reference == 1705276800.0
+    assert page.reference_date.isoformat() == "2024-01-15"
+    assert page.reference_year == 2024
+    assert page.human_date(1705276800 - 0.01) == "Yesterday"
+    assert page.human_date(1705276800 - 0.0000001) == "Today"
+
+
+def test_renderer_invalid_timezone():
+    with pytest.raises(ValueError):
+        Renderer(1705276800, timezone="Not/AZone")
+
+
+# =============================================================================
+# Bulk ISO 8601 parsing
+# =============================================================================
+
+def _iso_samples(template_offset, fraction_digits=0, count=200):
+    """Timestamps spread over several centuries, formatted in one layout."""
+    from datetime import datetime, timedelta, timezone
+    sign = 1 if template_offset >= 0 else -1
+    tz = timezone(timedelta(minutes=template_offset))
+    values = []
+    for i in range(count):
+        seconds = -5e9 + i * 5.3e7 + i * 0.123457
+        dt = datetime.fromtimestamp(seconds, tz=tz)
+        text = dt.isoformat(timespec='microseconds' if fraction_digits else 'seconds')
+        if fraction_digits:
+            head, _, rest = text.partition('.')
+            text = head + '.' + rest[:fraction_digits] + rest[6:]
+        if template_offset == 0 and sign == 1:
+            text = text.replace('+00:00', 'Z')
+        values.append(text)
+    return values
+
+
+@pytest.mark.parametrize("offset,digits", [(0, 0), (330, 0), (-480, 3), (0, 6), (345, 1)])
+def test_parse_iso_column_matches_to_timestamp(offset, digits):
+    values = _iso_samples(offset, digits)
+    column = parse_iso_column(values)
+    assert column.layout is not None
+    assert list(column.errors) == [0] * len(values)
+    assert list(column.timestamps) == [_to_timestamp(v) for v in values]
+
+
+def test_parse_iso_column_layout_names():
+    assert parse_iso_column(["2024-01-15T08:30:00Z"]).layout == "YYYY-MM-DDTHH:MM:SSZ"
+    assert parse_iso_column(["2024-01-15 08:30+05:30"]).layout == "YYYY-MM-DD HH:MM+HH:MM"
+    assert parse_iso_column(["2024-01-15T08:30:00.123-08:00"]).layout == (
+        "YYYY-MM-DDTHH:MM:SS.fff+HH:MM")
+    assert parse_iso_column([1705307400]).layout is None
+
+
+def test_parse_iso_column_flags_invalid_values():
+    values = ["2024-01-15T08:30:00Z", "2024-02-30T08:30:00Z", "2024-13-01T08:30:00Z",
+              "2024-01-15T24:00:00Z", "2024-01-15T23:59:60Z", "0000-01-15T08:30:00Z",
+              "2024-01-15T08:30:00+24:00", "2024-01-15T08:3x:00Z", "not a date",
+              "２０２４-01-15T08:30:00Z", None, "2024-01-16T08:30:00Z"]
+    column = parse_iso_column(values)
+    assert list(column.errors) == [0] + [1] * 10 + [0]
+    assert column.timestamps[0] == 1705307400.0
+    assert column.timestamps[-1] == 1705393800.0
+    assert all(t != t for t in column.timestamps[1:-1])  # NaN
+
+
+def test_parse_iso_column_flags_ints_too_large_for_a_float():
+    # All-numeric input, and mixed input through the per-element fallback
+    for values in ([1705307400, 10 ** 400, 1.5], ["2024-01-15T08:30:00Z", 10 ** 400, 1.5]):
+        column = parse_iso_column(values)
+        assert list(column.errors) == [0, 1, 0]
+        assert column.timestamps[0] == 1705307400.0 and column.timestamps[2] == 1.5
+        assert column.timestamps[1] != column.timestamps[1]  # NaN
+
+
+def test_parse_iso_column_falls_back_per_element():
+    from datetime import datetime, timezone
+    values = ["2024-01-15T08:30:00Z", "2024-01-15T09:30:00+01:00",
+              "2024-01-15T08:30:00.5Z", 1705307400, 1705307400.25,
+              datetime(2024, 1, 15, 8, 30, tzinfo=timezone.utc), "2024-01-15"]
+    column = parse_iso_column(values)
+    assert list(column.timestamps) == [_to_timestamp(v) for v in values]
+    assert list(column.errors) == [0] * len(values)
+
+
+def test_parse_iso_column_sniffs_most_common_layout():
+    values = ["2024-01-15T08:30:00+05:30"] + ["2024-01-15T08:30:00Z"] * 5
+    assert parse_iso_column(values).layout == "YYYY-MM-DDTHH:MM:SSZ"
+    assert parse_iso_column(iter(values), sample_size=1).layout == (
+        "YYYY-MM-DDTHH:MM:SS+HH:MM")
+
+
+def test_parse_iso_column_mixed_offsets_across_chunks():
+    offsets = ["+05:30", "-08:00", "+00:00", "Z", "+14:00"]
+    values = [f"2024-01-{1 + i % 28:02d}T{i % 24:02d}:30:00{offsets[i % 4]}"
+              for i in range(10000)]
+    values[5000] = "2024-01-15T08:30:00+99:00"
+    values[9000] = "2024-01-15T08:30:00" + offsets[4]
+    column = parse_iso_column(values)
+    expected = [_to_timestamp(v) if i != 5000 else None for i, v in enumerate(values)]
+    assert [t if e == 0 else None for t, e in zip(column.timestamps, column.errors)] == expected
+
+
+# =============================================================================
+# Run-length results for sorted input
+# =============================================================================
+
+def _log_stream(start, count, step):
+    """Ascending timestamps with fractional gaps, as a log would produce."""
+    return [start + i * step + (i % 7) * step / 10 for i in range(count)]
+
+
+@pytest.mark.parametrize("step", [0.5, 37, 3600.3, 86400 * 3.1])
+def test_timeago_runs_match_timeago_many(step):
+    stamps = _log_stream(REFERENCE - 400 * step, 800, step)
+    for values in (stamps, stamps[::-1]):
+        runs = timeago_runs(values, REFERENCE)
+        assert runs.expand() == timeago_many(values, REFERENCE)
+        assert all(a != b for a, b in zip(runs.labels, runs.labels[1:]))
+
+
+def test_timeago_runs_work_scales_with_labels(monkeypatch):
+    import whenwords
+    calls = []
+    label = whenwords._timeago_label
+    monkeypatch.setattr(whenwords, '_timeago_label', lambda diff: calls.append(diff) or label(diff))
+    stamps = _log_stream(REFERENCE - 3 * 3600, 20000, 0.5)
+    runs = timeago_runs(stamps, REFERENCE)
+    assert len(calls) < 40 * len(runs.labels)
+    assert list(runs.lengths) == [len(list(g)) for _, g in groupby(timeago_many(stamps, REFERENCE))]
+
+
+def test_timeago_runs_unsorted_and_mixed_types():
+    values = ["2024-01-15T08:30:00Z", 1705300000, "2024-01-15T08:30:00+01:00", 1705307400.5]
+    runs = timeago_runs(values, REFERENCE)
+    assert runs.expand() == timeago_many(values, REFERENCE)
+    assert timeago_runs(values) == LabelRuns(["just now"], array('Q', [4]))
+    assert timeago_runs([], REFERENCE).expand() == []
+    with pytest.raises(ValueError, match="Invalid timestamp format"):
+        timeago_runs([1705300000, "later"], REFERENCE)
+
+
+@pytest.mark.parametrize("timezone", [None, "America/New_York", "Australia/Lord_Howe"])
+def test_human_date_runs_match_human_date_many(timezone):
+    stamps = _log_stream(REFERENCE - 300 * 86400, 3000, 17000.3)
+    for values in (stamps, stamps[::-1], stamps[::2] + stamps[1::2]):
+        runs = human_date_runs(values, REFERENCE, timezone=timezone)
+        assert runs.expand() == human_date_many(values, REFERENCE, timezone=timezone)
+
+
+def test_human_date_runs_local_day_stepping_back():
+    # America/Goose_Bay fell back from 00:01 to 23:01 local at 1004238060
+    transition = 1004238060
+    stamps = list(range(transition - 7200, transition + 7200, 60))
+    runs = human_date_runs(stamps, transition, timezone="America/Goose_Bay")
+    assert runs.expand() == human_date_many(stamps, transition, timezone="America/Goose_Bay")
+    assert runs.labels == ["Today", "Tomorrow", "Today", "Tomorrow"]
+    assert human_date_runs(stamps).labels == ["Today"]
+
+
+# =============================================================================
+# NumPy arrays in human_date_many
+# =============================================================================
+
+def _array_samples(np, reference):
+    """Whole, fractional and sub-microsecond timestamps across ±400 days."""
+    rng = np.random.default_rng(7)
+    near = reference + rng.integers(-9 * 86400, 9 * 86400, 3000)
+    far = reference + rng.integers(-400 * 86400, 400 * 86400, 1000)
+    midnights = (reference // 86400 + np.arange(-8, 9)) * 86400
+    edges = np.concatenate([midnights - 1, midnights, midnights + 1])
+    return near, far, edges
+
+
+@pytest.mark.parametrize("timezone", [
+    None, "America/New_York", "Australia/Lord_Howe", "Asia/Kolkata", "America/Goose_Bay"])
+def test_human_date_many_numpy_matches_scalar(timezone):
+    np = pytest.importorskip("numpy")
+    for reference in (REFERENCE, 1711846800, 1004238060, 1735603200):
+        near, far, edges = _array_samples(np, reference)
+        ints = np.concatenate([near, far, edges])
+        floats = np.concatenate([ints + 0.5, edges - 1e-7, edges - 0.01, edges + 0.9999996])
+        for values in (ints, floats):
+            expected = [human_date(float(t), reference, timezone=timezone) for t in values]
+            assert human_date_many(values, reference, timezone=timezone) == expected
+            encoded = human_date_many(values, reference, timezone=timezone, encoded=True)
+            assert encoded.decode() == expected
+            assert len(encoded.labels) == len(set(expected))
+
+
+def test_human_date_many_numpy_edge_cases():
+    np = pytest.importorskip("numpy")
+    assert human_date_many(np.array([], dtype=np.int64), REFERENCE) == []
+    assert human_date_many(np.array([1, 2]), None) == ["Today", "Today"]
+    assert human_date_many(np.array([REFERENCE], dtype=np.int32), REFERENCE) == ["Today"]
+    with pytest.raises(ValueError):
+        human_date_many(np.array([REFERENCE, np.nan]), REFERENCE)
+    # Non-numeric arrays take the per-item path
+    assert human_date_many(np.array(["2024-01-14T12:00:00Z"]), REFERENCE) == [
+        human_date("2024-01-14T12:00:00Z", REFERENCE)]
+    # NaN raises even without a reference, as scalar human_date does
+    with pytest.raises(ValueError):
+        human_date_many(np.array([np.nan]))
+    # Past year 9999 raises like the scalar path, even for "Today"/"Tomorrow"
+    for stamps, reference in (([3e11], 3e11), ([REFERENCE], 3e11), ([3e11], REFERENCE),
+                              ([253402300799 + 86400], 253402300799)):
+        with pytest.raises(ValueError, match="out of range"):
+            human_date(stamps[0], reference)
+        with pytest.raises(ValueError, match="out of range"):
+            human_date_many(np.array(stamps), reference)
+    # Values far outside the offset table's window are converted one by one
+    outlying = [REFERENCE, 253402000000, -62135510400, -631152000 - 18000]
+    assert human_date_many(np.array(outlying), REFERENCE, "America/New_York") == \
+        [human_date(t, REFERENCE, timezone="America/New_York") for t in outlying]
+
+
+# =============================================================================
+# Opt-in result caching
+# =============================================================================
+
+@pytest.fixture
+def caching():
+    enable_cache(maxsize=64)
+    yield
+    disable_cache()
+
+
+def test_cached_results_match_uncached(caching):
+    diffs = [0, 44.6, 45, 89.5, 90, 150, 150.5, 2699.99, 5400, 129600, 45 * 86400 + 0.5,
+             548 * 86400 - 0.25, 3e9]
+    diffs += [-d for d in diffs]
+    disable_cache('timeago')
+    expected = [timeago(REFERENCE - diff, REFERENCE) for diff in diffs]
+    enable_cache('timeago', maxsize=64)
+    for _ in range(2):
+        assert [timeago(REFERENCE - diff, REFERENCE) for diff in diffs] == expected
+    samples = [(h, REFERENCE, tz) for h in HUMAN_DATE_SAMPLES
+               for tz in (None, "America/New_York")]
+    for _ in range(2):
+        for args in samples:
+            assert human_date(*args) == human_date(args[0], args[1], timezone=args[2])
+            assert date_range(args[0], args[1], args[2]) == date_range(args[1], args[0], args[2])
+        assert duration(3661, {'compact': 1}) == "1h 1m"
+        assert duration(3661.0, {'compact': True}) == "1h 1m"
+        assert duration(3661) == "1 hour, 1 minute"
+        assert parse_duration("  2H 30M ") == parse_duration("2h 30m") == 9000
+    info = cache_info()
+    assert set(info) == {'timeago', 'duration', 'parse_duration', 'human_date', 'date_range'}
+    assert all(i.hits > 0 for i in info.values())
+
+
+def test_timeago_cache_shares_equivalent_differences(caching):
+    assert timeago(130, 200) == timeago(1130, 1200) == "1 minute ago"
+    # 70.25 s and 70.4 s share the entry for (70, 71); 70 s has its own
+    assert timeago(1130.25, 1200.5) == timeago(1130.75, 1201) == timeago(0.1, 70.5)
+    assert cache_info()['timeago'][:2] == (3, 2)
+    # 150 s rounds half to even (2 minutes); 150.5 s does not
+    assert timeago(0, 150) == "2 minutes ago"
+    assert timeago(0, 150.5) == "3 minutes ago"
+
+
+def test_cache_stays_bounded_under_churn(caching):
+    for i in range(5000):
+        timeago(REFERENCE - i * 7.3, REFERENCE)
+        duration(i)
+        parse_duration(f"{i}m")
+    info = cache_info()
+    assert info['timeago'].currsize == info['duration'].currsize == 64
+    assert info['parse_duration'].currsize == 64
+    parse_duration("1s " * 40)
+    assert cache_info()['parse_duration'].currsize == 64
+    assert cache_info()['parse_duration'].misses == 5000
+
+
+def test_cache_lru_keeps_recent_entries():
+    enable_cache('duration', maxsize=2)
+    try:
+        duration(1), duration(2), duration(1), duration(3)
+        duration(1)
+        assert cache_info()['duration'][:2] == (2, 3)
+        duration(2)
+        assert cache_info()['duration'][:2] == (2, 4)
+    finally:
+        disable_cache()
+
+
+def test_cache_ttl_expires_entries():
+    now = [0.0]
+    enable_cache('parse_duration', maxsize=10, ttl=5, clock=lambda: now[0])
+    try:
+        parse_duration("2h")
+        now[0] = 4.9
+        parse_duration("2h")
+        parse_duration("3h")
+        assert cache_info()['parse_duration'][:4] == (1, 2, 10, 2)
+        now[0] = 5.0
+        parse_duration("2h")
+        assert cache_info()['parse_duration'][:4] == (1, 3, 10, 2)
+        now[0] = 20.0
+        parse_duration("4h")
+        assert cache_info()['parse_duration'].currsize == 1
+    finally:
+        disable_cache()
+
+
+def test_cache_errors_clear_and_disable(caching):
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            parse_duration("5 parsecs")
+        with pytest.raises(ValueError):
+            human_date(REFERENCE, REFERENCE, timezone="Not/A_Zone")
+        with pytest.raises(ValueError):
+            duration(-1)
+    assert cache_info()['parse_duration'].currsize == 0
+    assert cache_info()['human_date'].currsize == 0
+
+    timeago(100, 200)
+    cache_clear('timeago')
+    assert cache_info()['timeago'] == (0, 0, 64, 0, None)
+    disable_cache('timeago')
+    assert 'timeago' not in cache_info()
+    with pytest.raises(ValueError):
+        enable_cache('humanize')
+    with pytest.raises(ValueError):
+        enable_cache(maxsize=0)
+
+
+# =============================================================================
+# Exportable rule tables
+# =============================================================================
+
+def _rule_diffs():
+    """Differences at and around every timeago boundary and rounding half."""
+    import whenwords
+    points = list(whenwords._TIMEAGO_THRESHOLDS)
+    for divisor in (60, 3600, 86400, 30 * 86400, 365 * 86400):
+        points += [(n + 0.5) * divisor for n in range(120)]
+    diffs = [0, 0.5, 3e9]
+    for p in points:
+        diffs += [p - 1, p - 0.5, p, p + 0.5, p + 1]
+    return diffs + [-d for d in diffs]
+
+
+@pytest.mark.parametrize("fmt", ["json", "binary"])
+def test_rule_table_timeago_matches_module(fmt):
+    rules = load_rules(export_rules(fmt))
+    for diff in _rule_diffs():
+        assert rules.timeago(REFERENCE - diff, REFERENCE) == timeago(REFERENCE - diff, REFERENCE)
+    assert rules.timeago("2024-01-15T08:30:00Z") == "just now"
+
+
+@pytest.mark.parametrize("fmt", ["json", "binary"])
+def test_rule_table_duration_matches_module(fmt):
+    rules = load_rules(export_rules(fmt))
+    values = [0, 0.4, 1, 29.5, 30, 59.5, 89, 3599, 3600, 5399, 5400, 86399, 93784,
+              2591999, 31535999, 31536000 * 2.5, 10 ** 10]
+    values += [v * 7 + 0.25 for v in range(0, 200000, 997)]
+    # Beyond 2**53 only exact integer division agrees
+    import random
+    rng = random.Random(38)
+    values += [749528201124148029900, float(2 ** 60), 2 ** 53 + 1]
+    values += [rng.randrange(2 ** 53, 10 ** 22) for _ in range(300)]
+    option_sets = [None, {'compact': True}, {'max_units': 1}, {'max_units': 3},
+                   {'compact': True, 'max_units': 6}, {'max_units': 0}]
+    for seconds in values:
+        for options in option_sets:
+            assert rules.duration(seconds, options) == duration(seconds, options)
+    with pytest.raises(ValueError, match="non-negative"):
+        rules.duration(-1)
+
+
+def test_export_rules_formats():
+    import json
+    table = json.loads(export_rules())
+    assert table['version'] == 1
+    assert table['timeago']['thresholds'][0] == 45
+    assert table['duration']['units'][1] == ['month', 'mo', 30 * 86400]
+    binary = export_rules('binary')
+    assert binary[:4] == b'WWRT' and len(binary) < len(export_rules())
+    assert load_rules(binary).rules == load_rules(export_rules()).rules
+    with pytest.raises(ValueError, match="Unknown rules format"):
+        export_rules('yaml')
+    with pytest.raises(ValueError, match="Not a whenwords rules table"):
+        load_rules(b'nope')
+    with pytest.raises(ValueError, match="Unsupported rules version"):
+        RuleTable(dict(table, version=2))
+
+
+def test_rule_table_follows_edited_rules():
+    import json
+    table = json.loads(export_rules())
+    table['timeago']['past'] = "{n} {unit} back"
+    table['duration']['separator'] = [" and ", "+"]
+    rules = RuleTable(table)
+    assert rules.timeago(1704049200, 1704067200) == "5 hours back"
+    assert rules.duration(3661) == "1 hour and 1 minute"
+    assert rules.duration(3661, {'compact': True}) == "1h+1m"
+
+
+# =============================================================================
+# Interval coalescing
+# =============================================================================
+
+def _coalesce_by_brute_force(ranges, timezone, gap_days):
+    """Merge by repeated pairwise unions, then format with date_range."""
+    from datetime import datetime, timezone as dt_timezone
+    from zoneinfo import ZoneInfo
+    tz = ZoneInfo(timezone) if timezone else dt_timezone.utc
+
+    def day(ts):
+        return datetime.fromtimestamp(ts, tz=tz).date().toordinal()
+
+    groups = [[min(pair), max(pair), day(min(pair)), day(max(pair))] for pair in ranges]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(groups)):
+            for j in range(i + 1, len(groups)):
+                a, b = groups[i], groups[j]
+                if a[2] <= b[3] + gap_days and b[2] <= a[3] + gap_days:
+                    groups[i] = [min(a[0], b[0]), max(a[1], b[1]),
+                                 min(a[2], b[2]), max(a[3], b[3])]
+                    del groups[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [date_range(g[0], g[1], timezone=timezone) for g in sorted(groups, key=lambda g: g[2])]
+
+
+@pytest.mark.parametrize("timezone", [None, "America/New_York", "Pacific/Auckland"])
+@pytest.mark.parametrize("gap_days", [0, 1])
+def test_coalesce_date_ranges_matches_brute_force(timezone, gap_days):
+    import random
+    rng = random.Random(5)
+    ranges = []
+    for _ in range(150):
+        start = REFERENCE + rng.randrange(-200 * 86400, 200 * 86400)
+        end = start + rng.choice((0, 3600, 20 * 3600, 2 * 86400, 9 * 86400))
+        ranges.append((end, start) if rng.random() < 0.3 else (start, end))
+    ranges += ranges[:20]  # duplicates
+    assert coalesce_date_ranges(ranges, timezone, gap_days) == \
+        _coalesce_by_brute_force(ranges, timezone, gap_days)
+
+
+def test_coalesce_date_ranges_examples():
+    day = 86400
+    jan15 = 1705276800  # 2024-01-15 00:00 UTC
+    # Same-day neighbours merge; the next day only with gap_days=1
+    ranges = [(jan15 + 3600, jan15 + 7200), (jan15 + 20 * 3600, jan15 + 22 * 3600),
+              ("2024-01-16T09:00:00Z", "2024-01-16T10:00:00Z")]
+    assert coalesce_date_ranges(ranges) == ["January 15, 2024", "January 16, 2024"]
+    assert coalesce_date_ranges(ranges, gap_days=1) == ["January 15–16, 2024"]
+    # A range across the new year, and one swapped pair inside it
+    ranges = [(jan15 - 20 * day, jan15 - 10 * day), (jan15 - 12 * day, jan15 - 15 * day)]
+    assert coalesce_date_ranges(ranges) == ["December 26, 2023 – January 5, 2024"]
+    # In New York, 02:00 UTC is still the previous local day
+    assert coalesce_date_ranges([(jan15 + 2 * 3600, jan15 + 3 * 3600),
+                                 (jan15 - 3600, jan15)], "America/New_York") == ["January 14, 2024"]
+    assert coalesce_date_ranges([]) == []
+    with pytest.raises(ValueError):
+        coalesce_date_ranges([(jan15, jan15)], "Nowhere/Special")
+
+
+# =============================================================================
+# On-disk snapshots
+# =============================================================================
+
+SNAPSHOT_ZONES = ["America/New_York", "Europe/London", "Australia/Lord_Howe"]
+SNAPSHOT_START, SNAPSHOT_END = "2020-01-01T00:00:00Z", "2031-01-01T00:00:00Z"
+
+
+@pytest.fixture
+def offset_tables(monkeypatch):
+    """Start with no offset tables, as a new worker process does."""
+    import whenwords
+    tables = {}
+    monkeypatch.setattr(whenwords, '_OFFSET_TABLES', tables)
+    return tables
+
+
+def test_snapshot_round_trip(tmp_path, offset_tables):
+    import whenwords
+    path = str(tmp_path / "tables.snap")
+    save_snapshot(path, SNAPSHOT_ZONES, SNAPSHOT_START, SNAPSHOT_END)
+    assert offset_tables == {}
+    assert load_snapshot(path)
+    assert set(offset_tables) == set(SNAPSHOT_ZONES)
+
+    lo, hi = int(_to_timestamp(SNAPSHOT_START)), int(_to_timestamp(SNAPSHOT_END))
+    for name in SNAPSHOT_ZONES:
+        table = offset_tables[name]
+        fresh = whenwords._OffsetTable.build(whenwords._resolve_tz(name), lo, hi)
+        assert (table.starts, table.offsets, table.lo, table.hi) == \
+            (fresh.starts, fresh.offsets, fresh.lo, fresh.hi)
+
+    # Batches use the loaded tables and still agree with the scalar path
+    stamps = [REFERENCE + i * 3 * 3607 for i in range(-300, 300)]
+    for name in SNAPSHOT_ZONES:
+        loaded = offset_tables[name]
+        assert human_date_many(stamps, REFERENCE, name) == \
+            [human_date(ts, REFERENCE, timezone=name) for ts in stamps]
+        assert offset_tables[name] is loaded
+
+
+def test_snapshot_invalidated_by_version_changes(tmp_path, offset_tables, monkeypatch):
+    import whenwords
+    path = str(tmp_path / "tables.snap")
+    save_snapshot(path, SNAPSHOT_ZONES, SNAPSHOT_START, SNAPSHOT_END)
+
+    version = whenwords.__version__
+    monkeypatch.setattr(whenwords, '__version__', "99.0.0")
+    assert not load_snapshot(path)
+    monkeypatch.setattr(whenwords, '__version__', version)
+    assert load_snapshot(path)
+    offset_tables.clear()
+    monkeypatch.setattr(whenwords, '_tzdata_version', lambda: "2099z")
+    assert not load_snapshot(path)
+    assert offset_tables == {}
+
+
+def test_snapshot_rejects_missing_and_malformed_files(tmp_path, offset_tables):
+    path = tmp_path / "tables.snap"
+    assert not load_snapshot(str(path))
+    path.write_bytes(b"")
+    assert not load_snapshot(str(path))
+    path.write_bytes(b"not a snapshot at all")
+    assert not load_snapshot(str(path))
+
+    save_snapshot(str(path), SNAPSHOT_ZONES, SNAPSHOT_START, SNAPSHOT_END)
+    data = path.read_bytes()
+    path.write_bytes(data[:-8])
+    assert not load_snapshot(str(path))
+    assert offset_tables == {}
+    with pytest.raises(ValueError):
+        save_snapshot(str(path), ["Nowhere/Special"], SNAPSHOT_START, SNAPSHOT_END)
+
+
+def test_load_snapshot_keeps_wider_tables(tmp_path, offset_tables):
+    path = str(tmp_path / "tables.snap")
+    save_snapshot(path, ["Europe/London"], "2024-01-01T00:00:00Z", "2024-06-01T00:00:00Z")
+    wider = _offset_table("Europe/London", 1577836800, 1924992000)
+    assert load_snapshot(path)
+    assert offset_tables["Europe/London"] is wider
+
+
+def test_warm_start_rebuilds_only_when_needed(tmp_path, offset_tables, monkeypatch):
+    import whenwords
+    path = str(tmp_path / "tables.snap")
+    assert not warm_start(path, SNAPSHOT_ZONES, SNAPSHOT_START, SNAPSHOT_END)
+    assert set(offset_tables) == set(SNAPSHOT_ZONES)
+    offset_tables.clear()
+    assert warm_start(path, SNAPSHOT_ZONES[:2], SNAPSHOT_START, "2025-01-01T00:00:00Z")
+    assert set(offset_tables) == set(SNAPSHOT_ZONES)
+
+    # A zone or span the snapshot lacks, or a new tzdata, rebuilds it
+    assert not warm_start(path, ["Asia/Kolkata"], SNAPSHOT_START, SNAPSHOT_END)
+    assert not warm_start(path, ["Asia/Kolkata"], SNAPSHOT_START, "2040-01-01T00:00:00Z")
+    monkeypatch.setattr(whenwords, '_tzdata_version', lambda: "2099z")
+    assert not warm_start(path, ["Asia/Kolkata"], SNAPSHOT_START, SNAPSHOT_END)
+    assert warm_start(path, ["Asia/Kolkata"], SNAPSHOT_START, SNAPSHOT_END)
+
+
+def test_snapshot_loads_in_another_process(tmp_path):
+    import os
+    import subprocess
+    import sys
+    path = str(tmp_path / "tables.snap")
+    save_snapshot(path, SNAPSHOT_ZONES, SNAPSHOT_START, SNAPSHOT_END)
+    script = ("import sys, whenwords\n"
+              "print(whenwords.load_snapshot(sys.argv[1]), "
+              "sorted(whenwords._OFFSET_TABLES))\n")
+    result = subprocess.run([sys.executable, "-c", script, path], capture_output=True,
+                            text=True, check=True, cwd=os.path.dirname(__file__))
+    assert result.stdout.strip() == f"True {sorted(SNAPSHOT_ZONES)}"
+
+
+# =============================================================================
+# Sessionizing event streams
+# =============================================================================
+
+def _event_stream(seed: int = 42, count: int = 3000):
+    """Time-ordered (user, timestamp) events: bursts with idle stretches."""
+    import random
+    rng = random.Random(seed)
+    t = REFERENCE - 5 * 86400
+    events = []
+    for _ in range(count):
+        t += rng.choice((0, 5, 60, 400, 1799, 1800, 1801, 7200))
+        events.append((f"user{rng.randrange(40)}", t))
+    return events
+
+
+def _sessions_by_brute_force(events, gap):
+    by_key = {}
+    for key, ts in events:
+        by_key.setdefault(key, []).append(ts)
+    sessions = set()
+    for key, stamps in by_key.items():
+        start = previous = stamps[0]
+        count = 0
+        for ts in stamps:
+            if ts - previous > gap:
+                sessions.add((key, start, previous, count))
+                start, count = ts, 0
+            previous = ts
+            count += 1
+        sessions.add((key, start, previous, count))
+    return sessions
+
+
+@pytest.mark.parametrize("gap", ["30m", 1800, 0, "2h"])
+def test_sessionize_matches_brute_force(gap):
+    events = _event_stream()
+    sessions = list(sessionize(events, gap, timezone="America/New_York"))
+    gap_seconds = parse_duration(gap) if isinstance(gap, str) else gap
+    assert {(s.key, s.start, s.end, s.events) for s in sessions} == \
+        _sessions_by_brute_force(events, gap_seconds)
+    assert sum(s.events for s in sessions) == len(events)
+    for s in sessions[:50]:
+        assert s.length == duration(s.end - s.start)
+        assert s.span == date_range(s.start, s.end, timezone="America/New_York")
+
+
+def test_sessionize_yields_sessions_as_soon_as_they_close():
+    events = _event_stream()
+    consumed = []
+
+    def stream():
+        for index, event in enumerate(events):
+            consumed.append(index)
+            yield event
+
+    gap = 1800
+    for session in sessionize(stream(), gap):
+        if len(consumed) < len(events):
+            # Closed by the event just read, and not a moment earlier
+            now = events[consumed[-1]][1]
+            assert now - session.end > gap
+            assert events[consumed[-1] - 1][1] - session.end <= gap
+    assert len(consumed) == len(events)
+
+
+def test_sessionize_options_and_errors():
+    events = [("a", "2024-01-15T23:50:00Z"), ("a", "2024-01-16T00:20:00Z"),
+              ("b", "2024-01-16T00:21:00Z")]
+    first = next(sessionize(events, "30m", duration_options={'compact': True}))
+    assert first == Session("a", 1705362600.0, 1705364400.0, 2, "30m",
+                            "January 15–16, 2024")
+    tokyo = next(sessionize(events, "30m", timezone="Asia/Tokyo"))
+    assert tokyo.span == "January 16, 2024"
+    assert [s.key for s in sessionize(events, "29m")] == ["a", "a", "b"]
+    assert list(sessionize([], "30m")) == []
+
+    with pytest.raises(ValueError):
+        list(sessionize(events[::-1], "30m"))
+    for gap in (-1, float('nan'), float('inf'), "soon"):
+        with pytest.raises(ValueError):
+            list(sessionize(events, gap))
+    with pytest.raises(ValueError):
+        list(sessionize(events, "30m", timezone="Nowhere/Special"))
+
+
+# =============================================================================
+# Last-seen index
+# =============================================================================
+
+def _last_seen_times(reference: int):
+    """Differences at every timeago threshold and rounding half (±1 s), both ways."""
+    import random
+    from whenwords import _TIMEAGO_THRESHOLDS, _TIMEAGO_RULES
+    diffs = {0, 1, 150 * 365 * 86400}
+    for bound in _TIMEAGO_THRESHOLDS:
+        diffs.update((bound - 1, bound, bound + 1))
+    for _, divisor in _TIMEAGO_RULES:
+        for k in range(1, 40) if divisor else ():
+            half = divisor * k + divisor // 2
+            diffs.update((half - 1, half, half + 1))
+    rng = random.Random(43)
+    diffs.update(rng.randrange(3 * 365 * 86400) for _ in range(2000))
+    diffs = sorted(diffs) + [-d for d in sorted(diffs)[:200]]
+    return [reference - d for d in diffs]
+
+
+def test_last_seen_index_updates():
+    index = LastSeenIndex()
+    assert len(index) == 0 and index.get(0) is None
+    index.update(5, REFERENCE)
+    index.update(5, REFERENCE - 100)           # older: ignored
+    index.update(2, "2024-01-15T09:00:00.7Z")  # stored as whole seconds
+    assert index.get(5) == REFERENCE
+    assert index.get(2) == 1705309200
+    assert index.get(3) is None and index.get(99) is None and index.get("5") is None
+    assert len(index) == 2 and 5 in index and 4 not in index
+    assert index._times.typecode == 'q' and len(index._times) == 6
+    for key in (-1, "5", 2.0):
+        with pytest.raises(ValueError):
+            index.update(key, REFERENCE)
+
+    names = LastSeenIndex(interned=True)
+    names.update("ann", REFERENCE - 60)
+    names.update("bob", REFERENCE - 7200)
+    names.update("ann", REFERENCE)
+    assert names.get("ann") == REFERENCE and names.get("cyd") is None
+    assert len(names) == 2 and len(names._times) == 2
+
+
+def test_last_seen_index_rejects_before_storing():
+    index = LastSeenIndex()
+    names = LastSeenIndex(interned=True)
+    for timestamp in (2 ** 70, -(2 ** 63), 1e300, float('inf'), float('nan')):
+        with pytest.raises(ValueError):
+            index.update(0, timestamp)
+        with pytest.raises(ValueError):
+            names.update('a', timestamp)
+    assert len(index) == 0 and len(index._times) == 0 and 0 not in index
+    assert len(names) == 0 and len(names._times) == 0 and names._slots == {}
+
+    # A stray 64-bit ID can't grow the array; sparse IDs belong in interned mode
+    with pytest.raises(ValueError, match="interned=True"):
+        index.update(1455230879186325504, REFERENCE)
+    assert len(index._times) == 0
+    small = LastSeenIndex(max_key=10)
+    small.update(10, REFERENCE)
+    with pytest.raises(ValueError, match="max_key"):
+        small.update(11, REFERENCE)
+    assert len(small) == 1 and len(small._times) == 11
+
+
+def test_last_seen_index_renders_subsets():
+    reference = REFERENCE + 0.5
+    stamps = _last_seen_times(REFERENCE)
+    index = LastSeenIndex(interned=True)
+    for i, ts in enumerate(stamps):
+        index.update(f"user{i}", ts)
+    keys = [f"user{i}" for i in range(0, len(stamps), 3)] + ["nobody"]
+    assert index.timeago(keys, reference) == \
+        [timeago(index.get(key), reference) if key in index else None for key in keys]
+    assert index.human_date(keys, reference, "America/New_York") == \
+        [human_date(index.get(key), reference, timezone="America/New_York")
+         if key in index else None for key in keys]
+    assert index.timeago([], reference) == []
+
+
+@pytest.mark.parametrize("with_numpy", [True, False])
+@pytest.mark.parametrize("reference", [REFERENCE, REFERENCE + 0.5, REFERENCE + 0.25])
+def test_last_seen_index_counts_timeago_buckets(monkeypatch, with_numpy, reference):
+    import whenwords
+    from collections import Counter
+    if with_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(whenwords, 'np', None)
+    stamps = _last_seen_times(REFERENCE)
+    index = LastSeenIndex()
+    for key, ts in enumerate(stamps):
+        index.update(key * 2, ts)  # odd slots stay unseen
+
+    def label(ts):
+        parts = timeago_parts(ts, reference)
+        return parts._replace(is_future=False) if parts.unit == 'now' else parts
+
+    expected = Counter(label(ts) for ts in stamps)
+    counts = index.timeago_counts(reference)
+    assert counts == expected
+    # Past first, most recent first; then the future
+    order = [(p.is_future, TIMEAGO_UNITS.index(p.unit), p.n) for p in counts]
+    assert order == sorted(order)
+
+    keys = list(range(0, 2 * len(stamps), 5))
+    expected = Counter(label(index.get(k)) for k in keys if k in index)
+    assert index.timeago_counts(reference, keys) == expected
+    assert LastSeenIndex().timeago_counts(reference) == {}
+
+    # One "just now" bucket, from either side of the reference
+    around = LastSeenIndex()
+    around.update(0, REFERENCE - 10)
+    around.update(1, REFERENCE + 10)
+    assert around.timeago_counts(REFERENCE) == {TimeagoParts(0, 'now', False): 2}
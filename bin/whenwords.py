@@ -4,14 +4,38 @@ A library for converting timestamps to readable strings like "3 hours ago"
 and parsing duration strings like "2h 30m" into seconds.
 
 All functions are pure - no side effects, no I/O, no system clock access.
+The opt-in result cache (``enable_cache``) keeps state between calls but
+never changes a result; only its optional TTL reads a clock. The snapshot
+functions (``save_snapshot``, ``load_snapshot``, ``warm_start``) are the only
+ones that touch files.
 """
 
 import re
+import sys
+import json
 import math
-from datetime import datetime, timezone as dt_timezone
-from typing import Union, Optional, Dict, Any
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_right
+from itertools import chain, groupby, islice, repeat
+from operator import ge, itemgetter, le, sub
+from array import array
+from collections import Counter, OrderedDict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Union, Optional, Dict, Any, Iterable, List, NamedTuple
+import zoneinfo
 from zoneinfo import ZoneInfo
 
+try:
+    import numpy as np
+except ImportError:  # optional: only used for array input to human_date_many
+    np = None
+
+__version__ = "0.1.0"
+
 
 def _to_timestamp(value: Union[int, float, str, datetime]) -> float:
     """Convert various timestamp formats to Unix seconds."""
@@ -30,6 +54,16 @@ def _to_timestamp(value: Union[int, float, str, datetime]) -> float:
         raise ValueError(f"Invalid timestamp type: {type(value)}")
 
 
+def _resolve_tz(timezone: Optional[str]):
+    """Resolve an IANA timezone name (None means UTC) to a tzinfo."""
+    if timezone is None:
+        return dt_timezone.utc
+    try:
+        return ZoneInfo(timezone)
+    except Exception as e:
+        raise ValueError(f"Invalid timezone name: {timezone}") from e
+
+
 def timeago(timestamp: Union[int, float, str, datetime],
             reference: Optional[Union[int, float, str, datetime]] = None) -> str:
     """Return a human-readable relative time string.
@@ -50,52 +84,82 @@ def timeago(timestamp: Union[int, float, str, datetime],
     ts = _to_timestamp(timestamp)
     ref = _to_timestamp(reference) if reference is not None else ts
 
-    diff = ref - ts  # Positive if timestamp is in the past
-    abs_diff = abs(diff)
-    is_future = diff < 0
-
-    # Thresholds and formatting
-    if abs_diff < 45:
+    cache = _CACHES.get('timeago')
+    if cache is not None:
+        return cache.lookup(_timeago_key(ref - ts), _timeago_label, ref - ts)
+    return _timeago_label(ref - ts)
+
+
+# Exclusive upper bounds of |diff| (seconds) for each timeago bucket
+_TIMEAGO_THRESHOLDS = (
+    45, 90, 45 * 60, 90 * 60, 22 * 3600, 36 * 3600,
+    26 * 86400, 46 * 86400, 320 * 86400, 548 * 86400,
+)
+
+# Per bucket: (unit, divisor). A divisor of 0 means the count is always 1;
+# otherwise the count is round(|diff| / divisor).
+_TIMEAGO_RULES = (
+    ('now', 0),
+    ('minute', 0),
+    ('minute', 60),
+    ('hour', 0),
+    ('hour', 3600),
+    ('day', 0),
+    ('day', 86400),
+    ('month', 0),
+    ('month', 30 * 86400),
+    ('year', 0),
+    ('year', 365 * 86400),
+)
+
+# The last bucket is open-ended; larger year counts are formatted on demand
+_TIMEAGO_MAX_YEARS = 100
+
+
+def _timeago_strings(unit: str, max_n: int, future: bool) -> tuple:
+    """Interned labels for counts 0..max_n of a unit (index 0 is unused)."""
+    labels = [""]
+    for n in range(1, max_n + 1):
+        name = unit if n == 1 else f"{unit}s"
+        labels.append(sys.intern(f"in {n} {name}" if future else f"{n} {name} ago"))
+    return tuple(labels)
+
+
+def _build_timeago_labels() -> tuple:
+    """(past, future) label tuples for every bucket, indexed by count."""
+    labels = [(("just now",), ("just now",))]
+    bounds = _TIMEAGO_THRESHOLDS + (None,)
+    for (unit, divisor), upper in zip(_TIMEAGO_RULES[1:], bounds[1:]):
+        if not divisor:
+            max_n = 1
+        elif upper is None:
+            max_n = _TIMEAGO_MAX_YEARS
+        else:
+            max_n = round(upper / divisor)
+        labels.append((_timeago_strings(unit, max_n, False),
+                       _timeago_strings(unit, max_n, True)))
+    return tuple(labels)
+
+
+_TIMEAGO_LABELS = _build_timeago_labels()
+
+
+def _timeago_label(diff: float) -> str:
+    """Format a reference-minus-timestamp difference (in seconds)."""
+    abs_diff = -diff if diff < 0 else diff
+    bucket = bisect_right(_TIMEAGO_THRESHOLDS, abs_diff)
+    if bucket == 0:
         return "just now"
-    elif abs_diff < 90:
-        unit = "minute"
-        n = 1
-    elif abs_diff < 45 * 60:
-        unit = "minutes"
-        n = round(abs_diff / 60)
-    elif abs_diff < 90 * 60:
-        unit = "hour"
-        n = 1
-    elif abs_diff < 22 * 3600:
-        unit = "hours"
-        n = round(abs_diff / 3600)
-    elif abs_diff < 36 * 3600:
-        unit = "day"
-        n = 1
-    elif abs_diff < 26 * 86400:
-        unit = "days"
-        n = round(abs_diff / 86400)
-    elif abs_diff < 46 * 86400:
-        unit = "month"
-        n = 1
-    elif abs_diff < 320 * 86400:
-        unit = "months"
-        n = round(abs_diff / (30 * 86400))
-    elif abs_diff < 548 * 86400:
-        unit = "year"
-        n = 1
-    else:
-        unit = "years"
-        n = round(abs_diff / (365 * 86400))
 
-    # Format output
-    if n == 1 and unit[-1] == 's':
-        unit = unit[:-1]  # Remove plural
+    divisor = _TIMEAGO_RULES[bucket][1]
+    n = round(abs_diff / divisor) if divisor else 1
+    labels = _TIMEAGO_LABELS[bucket][diff < 0]
+    if n < len(labels):
+        return labels[n]
 
-    if is_future:
-        return f"in {n} {unit}"
-    else:
-        return f"{n} {unit} ago"
+    # Beyond the precomputed range (only reachable for years)
+    unit = _TIMEAGO_RULES[bucket][0]
+    return f"in {n} {unit}s" if diff < 0 else f"{n} {unit}s ago"
 
 
 def duration(seconds: Union[int, float],
@@ -124,50 +188,95 @@ def duration(seconds: Union[int, float],
 
     options = options or {}
     compact = options.get('compact', False)
-    max_units = options.get('max_units', 2)
+    max_units = options.get('max_units', _DURATION_MAX_UNITS)
+
+    cache = _CACHES.get('duration')
+    if cache is not None:
+        return cache.lookup((seconds, bool(compact), max_units),
+                            _duration_label, seconds, compact, max_units)
+    return _duration_label(seconds, compact, max_units)
 
+
+def _duration_label(seconds: Union[int, float], compact: bool, max_units: int) -> str:
+    """Format a validated, non-negative duration."""
     if seconds == 0:
         return "0s" if compact else "0 seconds"
 
-    # Unit definitions (from largest to smallest)
-    units = [
-        ('year', 'y', 365 * 86400),
-        ('month', 'mo', 30 * 86400),
-        ('day', 'd', 86400),
-        ('hour', 'h', 3600),
-        ('minute', 'm', 60),
-        ('second', 's', 1),
-    ]
+    parts = []
+    for index, count in _duration_counts(seconds, max_units):
+        unit_name, unit_abbr, _ = _DURATION_UNITS[index]
+        if compact:
+            parts.append(f"{count}{unit_abbr}")
+        else:
+            plural = unit_name if count == 1 else f"{unit_name}s"
+            parts.append(f"{count} {plural}")
+
+    if compact:
+        return " ".join(parts)
+    else:
+        return ", ".join(parts)
+
+
+# Unit definitions (from largest to smallest)
+_DURATION_UNITS = (
+    ('year', 'y', 365 * 86400),
+    ('month', 'mo', 30 * 86400),
+    ('day', 'd', 86400),
+    ('hour', 'h', 3600),
+    ('minute', 'm', 60),
+    ('second', 's', 1),
+)
 
+# Units shown when options don't say
+_DURATION_MAX_UNITS = 2
+
+
+def _duration_counts(seconds: Union[int, float], max_units: int) -> List[tuple]:
+    """The (unit index, count) pairs ``duration`` displays, largest first."""
+    if isinstance(seconds, int) or (isinstance(seconds, float) and seconds.is_integer()):
+        return _duration_counts_int(int(seconds), max_units)
+    return _duration_counts_float(seconds, max_units)
+
+
+def _duration_counts_int(seconds: int, max_units: int) -> List[tuple]:
+    """``_duration_counts`` for whole seconds, in exact integer arithmetic."""
     remaining = seconds
-    parts = []
+    counts = []
 
-    for unit_name, unit_abbr, unit_seconds in units:
+    for index, (_, _, unit_seconds) in enumerate(_DURATION_UNITS):
+        if remaining >= unit_seconds:
+            count, remaining = divmod(remaining, unit_seconds)
+
+            if len(counts) + 1 >= max_units:
+                # Round the last unit half up: remaining >= unit_seconds / 2
+                if 2 * remaining >= unit_seconds:
+                    count += 1
+                counts.append((index, count))
+                break
+            counts.append((index, count))
+
+    return counts
+
+
+def _duration_counts_float(seconds: Union[int, float], max_units: int) -> List[tuple]:
+    """``_duration_counts`` for fractional seconds."""
+    remaining = seconds
+    counts = []
+
+    for index, (_, _, unit_seconds) in enumerate(_DURATION_UNITS):
         if remaining >= unit_seconds:
             count = int(remaining / unit_seconds)
             remaining = remaining % unit_seconds
 
-            if compact:
-                parts.append(f"{count}{unit_abbr}")
-            else:
-                plural = unit_name if count == 1 else f"{unit_name}s"
-                parts.append(f"{count} {plural}")
-
-            if len(parts) >= max_units:
+            if len(counts) + 1 >= max_units:
                 # Round the last unit if there's remaining time
                 if remaining >= unit_seconds / 2:
                     count += 1
-                    if compact:
-                        parts[-1] = f"{count}{unit_abbr}"
-                    else:
-                        plural = unit_name if count == 1 else f"{unit_name}s"
-                        parts[-1] = f"{count} {plural}"
+                counts.append((index, count))
                 break
+            counts.append((index, count))
 
-    if compact:
-        return " ".join(parts)
-    else:
-        return ", ".join(parts)
+    return counts
 
 
 def parse_duration(duration_str: str) -> int:
@@ -195,6 +304,15 @@ def parse_duration(duration_str: str) -> int:
 
     duration_str = duration_str.strip()
 
+    # Units are case-insensitive, so equivalent spellings share an entry
+    cache = _CACHES.get('parse_duration')
+    if cache is not None and len(duration_str) <= _CACHE_MAX_KEY_LENGTH:
+        return cache.lookup(duration_str.lower(), _parse_duration, duration_str)
+    return _parse_duration(duration_str)
+
+
+def _parse_duration(duration_str: str) -> int:
+    """Parse a stripped, non-empty duration string."""
     # Check for negative values first
     if '-' in duration_str:
         raise ValueError("Negative durations are not allowed")
@@ -267,54 +385,72 @@ def human_date(timestamp: Union[int, float, str, datetime],
     ts = _to_timestamp(timestamp)
     ref = _to_timestamp(reference) if reference is not None else ts
 
-    # Determine timezone to use
-    if timezone is None:
-        tz = dt_timezone.utc
-    else:
-        try:
-            tz = ZoneInfo(timezone)
-        except Exception as e:
-            raise ValueError(f"Invalid timezone name: {timezone}") from e
+    cache = _CACHES.get('human_date')
+    if cache is not None:
+        # Dates depend only on the whole seconds fromtimestamp() would use
+        return cache.lookup((_whole_seconds(ts), _whole_seconds(ref), timezone),
+                            _human_date_uncached, ts, ref, timezone)
+    return _human_date_uncached(ts, ref, timezone)
+
+
+def _human_date_uncached(ts: float, ref: float, timezone: Optional[str]) -> str:
+    tz = _resolve_tz(timezone)
 
     # Convert to datetime objects in specified timezone
     dt = datetime.fromtimestamp(ts, tz=tz)
     ref_dt = datetime.fromtimestamp(ref, tz=tz)
 
-    # Get date components (ignoring time)
-    dt_date = dt.date()
-    ref_date = ref_dt.date()
+    return _human_date_label(dt.date(), ref_dt.date())
+
+
+# Layouts human_date chooses between, by day difference and year
+HUMAN_DATE_KINDS = ('today', 'yesterday', 'tomorrow', 'last_weekday',
+                    'this_weekday', 'month_day', 'month_day_year')
 
-    # Calculate day difference
-    day_diff = (dt_date - ref_date).days
 
+def _human_date_kind(day_diff: int, same_year: bool) -> int:
+    """Index into HUMAN_DATE_KINDS for a day difference."""
     # Same day
     if day_diff == 0:
-        return "Today"
+        return 0
 
     # Yesterday
     if day_diff == -1:
-        return "Yesterday"
+        return 1
 
     # Tomorrow
     if day_diff == 1:
-        return "Tomorrow"
+        return 2
 
     # Within past 7 days (2-6 days ago)
     if -6 <= day_diff <= -2:
-        weekday = dt.strftime("%A")
-        return f"Last {weekday}"
+        return 3
 
     # Within next 7 days (2-6 days future)
     if 2 <= day_diff <= 6:
-        weekday = dt.strftime("%A")
-        return f"This {weekday}"
+        return 4
 
-    # Same year
-    if dt.year == ref_dt.year:
-        return dt.strftime("%B %-d")
+    # Same year, or different year
+    return 5 if same_year else 6
 
-    # Different year
-    return dt.strftime("%B %-d, %Y")
+
+def _human_date_label(dt_date: date, ref_date: date) -> str:
+    """Format a local date relative to a local reference date."""
+    kind = _human_date_kind((dt_date - ref_date).days,
+                            dt_date.year == ref_date.year)
+    if kind == 0:
+        return "Today"
+    if kind == 1:
+        return "Yesterday"
+    if kind == 2:
+        return "Tomorrow"
+    if kind == 3:
+        return f"Last {dt_date.strftime('%A')}"
+    if kind == 4:
+        return f"This {dt_date.strftime('%A')}"
+    if kind == 5:
+        return dt_date.strftime("%B %-d")
+    return dt_date.strftime("%B %-d, %Y")
 
 
 def date_range(start: Union[int, float, str, datetime],
@@ -346,34 +482,2189 @@ def date_range(start: Union[int, float, str, datetime],
     if start_ts > end_ts:
         start_ts, end_ts = end_ts, start_ts
 
-    # Determine timezone to use
-    if timezone is None:
-        tz = dt_timezone.utc
-    else:
-        try:
-            tz = ZoneInfo(timezone)
-        except Exception as e:
-            raise ValueError(f"Invalid timezone name: {timezone}") from e
+    cache = _CACHES.get('date_range')
+    if cache is not None:
+        return cache.lookup((_whole_seconds(start_ts), _whole_seconds(end_ts), timezone),
+                            _date_range_uncached, start_ts, end_ts, timezone)
+    return _date_range_uncached(start_ts, end_ts, timezone)
+
+
+def _date_range_uncached(start_ts: float, end_ts: float, timezone: Optional[str]) -> str:
+    tz = _resolve_tz(timezone)
 
     # Convert to datetime objects in specified timezone
     start_dt = datetime.fromtimestamp(start_ts, tz=tz)
     end_dt = datetime.fromtimestamp(end_ts, tz=tz)
 
-    # Get date components
-    start_date = start_dt.date()
-    end_date = end_dt.date()
+    return _date_range_label(start_dt.date(), end_dt.date())
+
+
+# Layouts date_range chooses between, by which date parts are shared
+DATE_RANGE_LAYOUTS = ('same_day', 'same_month', 'same_year', 'different_years')
+
 
+def _date_range_layout(start_date: date, end_date: date) -> int:
+    """Index into DATE_RANGE_LAYOUTS for an ordered pair of local dates."""
     # Same day
     if start_date == end_date:
-        return start_dt.strftime("%B %-d, %Y")
+        return 0
 
     # Same month and year
-    if start_dt.month == end_dt.month and start_dt.year == end_dt.year:
-        return f"{start_dt.strftime('%B %-d')}–{end_dt.strftime('%-d, %Y')}"
+    if start_date.month == end_date.month and start_date.year == end_date.year:
+        return 1
 
     # Same year, different months
-    if start_dt.year == end_dt.year:
-        return f"{start_dt.strftime('%B %-d')} – {end_dt.strftime('%B %-d, %Y')}"
+    if start_date.year == end_date.year:
+        return 2
 
     # Different years
-    return f"{start_dt.strftime('%B %-d, %Y')} – {end_dt.strftime('%B %-d, %Y')}"
+    return 3
+
+
+def _date_range_label(start_date: date, end_date: date) -> str:
+    """Format an ordered pair of local dates as a range."""
+    layout = _date_range_layout(start_date, end_date)
+    if layout == 0:
+        return start_date.strftime("%B %-d, %Y")
+    if layout == 1:
+        return f"{start_date.strftime('%B %-d')}–{end_date.strftime('%-d, %Y')}"
+    if layout == 2:
+        return f"{start_date.strftime('%B %-d')} – {end_date.strftime('%B %-d, %Y')}"
+    return f"{start_date.strftime('%B %-d, %Y')} – {end_date.strftime('%B %-d, %Y')}"
+
+
+# =============================================================================
+# UTC-offset transition tables
+# =============================================================================
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Offset transitions in tzdata are never closer together than about a week,
+# so sampling once a day and bisecting between samples finds all of them.
+_OFFSET_SAMPLE_STEP = 86400
+
+
+def _whole_seconds(ts: float) -> int:
+    """Floor a timestamp to whole seconds, after rounding to microseconds.
+
+    This matches ``datetime.fromtimestamp``, which rounds to the nearest
+    microsecond (half to even) before splitting off the seconds.
+    """
+    if ts.is_integer():
+        return int(ts)
+    frac, whole = math.modf(ts)
+    seconds = int(whole)
+    micros = round(frac * 1e6)
+    if micros >= 1000000:
+        seconds += 1
+    elif micros < 0:
+        seconds -= 1
+    return seconds
+
+
+def _utc_offset(tz, seconds: int) -> int:
+    """The UTC offset of ``tz`` at a Unix time, in whole seconds."""
+    return int(datetime.fromtimestamp(seconds, tz=tz).utcoffset().total_seconds())
+
+
+class _OffsetTable:
+    """UTC-offset intervals of one timezone over a span of Unix seconds.
+
+    ``offsets[i]`` applies from ``starts[i]`` up to ``starts[i + 1]``. The
+    intervals are valid for Unix seconds in ``[lo, hi]``; ``offset_at`` and
+    ``local_day`` ask ``tz`` directly for anything outside that span.
+    """
+
+    __slots__ = ('starts', 'offsets', 'lo', 'hi', 'tz')
+
+    def __init__(self, starts: List[int], offsets: List[int], lo: int, hi: int, tz=None):
+        self.starts = starts
+        self.offsets = offsets
+        self.lo = lo
+        self.hi = hi
+        self.tz = tz
+
+    @classmethod
+    def build(cls, tz, lo: int, hi: int) -> '_OffsetTable':
+        """Sample ``tz`` across ``[lo, hi]`` and bisect each offset change."""
+        t = lo
+        offset = _utc_offset(tz, t)
+        starts = [lo]
+        offsets = [offset]
+        while t < hi:
+            next_t = min(t + _OFFSET_SAMPLE_STEP, hi)
+            next_offset = _utc_offset(tz, next_t)
+            if next_offset != offset:
+                # Find the first second with the new offset
+                before, after = t, next_t
+                while after - before > 1:
+                    middle = (before + after) // 2
+                    if _utc_offset(tz, middle) == offset:
+                        before = middle
+                    else:
+                        after = middle
+                starts.append(after)
+                offsets.append(next_offset)
+                offset = next_offset
+            t = next_t
+        return cls(starts, offsets, lo, hi, tz)
+
+    def covers(self, lo: int, hi: int) -> bool:
+        return self.lo <= lo and hi <= self.hi
+
+    def offset_at(self, seconds: int) -> int:
+        if self.lo <= seconds <= self.hi:
+            return self.offsets[bisect_right(self.starts, seconds) - 1]
+        return _utc_offset(self.tz, seconds)
+
+    def local_day(self, seconds: int) -> int:
+        """Local calendar day of a Unix time, as days since 1970-01-01."""
+        if self.lo <= seconds <= self.hi:
+            return (seconds + self.offsets[bisect_right(self.starts, seconds) - 1]) // 86400
+        return (datetime.fromtimestamp(seconds, tz=self.tz).date().toordinal()
+                - _EPOCH_ORDINAL)
+
+    def day_steps_back(self, lo: int, hi: int) -> bool:
+        """Whether the local day goes backwards anywhere in ``(lo, hi]``.
+
+        That happens when a fall-back transition crosses local midnight, so
+        the local day is no longer a non-decreasing function of time. Spans
+        the table doesn't cover are assumed to.
+        """
+        if not self.covers(lo, hi):
+            return True
+        return any(self.local_day(start) < self.local_day(start - 1)
+                   for start in self.starts[1:] if lo < start <= hi)
+
+
+_UTC_TABLE = _OffsetTable([-(2 ** 63)], [0], -(2 ** 63), 2 ** 63, dt_timezone.utc)
+
+# One table per zone name, widened as later batches need
+_OFFSET_TABLES: Dict[str, _OffsetTable] = {}
+
+# Longest span a table covers. Building costs about 1 ms per year, so one
+# outlying timestamp can't make a batch sample thousands of years; values
+# outside the span are converted one by one instead.
+_OFFSET_MAX_SPAN = 40 * 365 * 86400
+
+# Zones (and links) with one fixed offset at all times
+_FIXED_OFFSET_ZONES = frozenset(('UTC', 'UCT', 'GMT', 'GMT0', 'GMT+0', 'GMT-0',
+                                 'Greenwich', 'Universal', 'Zulu'))
+
+
+def _offset_table(timezone: Optional[str], lo: int, hi: int,
+                  anchor: Optional[int] = None) -> _OffsetTable:
+    """Return an offset table for ``timezone`` for values in ``[lo, hi]``.
+
+    Spans longer than ``_OFFSET_MAX_SPAN`` are cut to a window around
+    ``anchor`` (default ``lo``), e.g. a batch's reference time. The table
+    still answers for values outside its window, just more slowly.
+    """
+    if timezone is None:
+        return _UTC_TABLE
+    table = _OFFSET_TABLES.get(timezone)
+    if table is not None and table.covers(lo, hi):
+        return table
+    if hi - lo > _OFFSET_MAX_SPAN:
+        anchor = lo if anchor is None else anchor
+        lo = max(lo, anchor - _OFFSET_MAX_SPAN // 2)
+        hi = min(hi, lo + _OFFSET_MAX_SPAN)
+        lo = max(lo, hi - _OFFSET_MAX_SPAN)
+        if table is not None and table.covers(lo, hi):
+            return table
+    tz = _resolve_tz(timezone)
+    if timezone in _FIXED_OFFSET_ZONES or timezone.startswith('Etc/'):
+        table = _OffsetTable([-(2 ** 63)], [_utc_offset(tz, 0)], -(2 ** 63), 2 ** 63, tz)
+    else:
+        if table is not None and max(hi, table.hi) - min(lo, table.lo) <= _OFFSET_MAX_SPAN:
+            lo, hi = min(lo, table.lo), max(hi, table.hi)
+        table = _OffsetTable.build(tz, lo, hi)
+    _OFFSET_TABLES[timezone] = table
+    return table
+
+
+def _day_to_date(day: int) -> date:
+    return date.fromordinal(day + _EPOCH_ORDINAL)
+
+
+# =============================================================================
+# Batch and dictionary-encoded results
+# =============================================================================
+
+class EncodedLabels:
+    """Dictionary-encoded label column: integer codes plus a shared label table.
+
+    ``labels[codes[i]]`` is the string the scalar function returns for item
+    ``i``. Iterating, indexing, or calling ``decode()`` yields those strings.
+    """
+
+    __slots__ = ('codes', 'labels')
+
+    def __init__(self, codes: array, labels: List[str]):
+        self.codes = codes
+        self.labels = labels
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> str:
+        return self.labels[self.codes[index]]
+
+    def __iter__(self):
+        labels = self.labels
+        return (labels[code] for code in self.codes)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, EncodedLabels):
+            return NotImplemented
+        return self.decode() == other.decode()
+
+    def __repr__(self) -> str:
+        return f"EncodedLabels({len(self.codes)} items, {len(self.labels)} labels)"
+
+    def decode(self) -> List[str]:
+        """Return the per-item strings as a list."""
+        labels = self.labels
+        return [labels[code] for code in self.codes]
+
+
+class _LabelEncoder:
+    """Assigns consecutive integer codes to labels in first-seen order."""
+
+    __slots__ = ('codes', 'labels', '_index')
+
+    def __init__(self):
+        self.codes = array('I')
+        self.labels: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def add(self, label: str) -> None:
+        code = self._index.get(label)
+        if code is None:
+            code = self._index[label] = len(self.labels)
+            self.labels.append(label)
+        self.codes.append(code)
+
+    def result(self) -> EncodedLabels:
+        return EncodedLabels(self.codes, self.labels)
+
+
+def encode_labels(labels: Iterable[str]) -> EncodedLabels:
+    """Dictionary-encode an iterable of strings.
+
+    Use this to encode the output of a scalar loop:
+
+        >>> encoded = encode_labels(timeago(t, 1704067200) for t in (1704049200, 1704049300))
+        >>> list(encoded.codes), encoded.labels
+        ([0, 0], ['5 hours ago'])
+    """
+    encoder = _LabelEncoder()
+    for label in labels:
+        encoder.add(label)
+    return encoder.result()
+
+
+def timeago_many(timestamps: Iterable[Union[int, float, str, datetime]],
+                 reference: Optional[Union[int, float, str, datetime]] = None,
+                 encoded: bool = False):
+    """Apply ``timeago`` to many timestamps sharing one reference.
+
+    Args:
+        timestamps: Iterable of timestamps (any type ``timeago`` accepts)
+        reference: The shared reference time (defaults to each timestamp)
+        encoded: If True, return an ``EncodedLabels`` instead of a list
+
+    Returns:
+        A list of strings, or an ``EncodedLabels`` when ``encoded`` is True
+
+    Examples:
+        >>> timeago_many([1704049200, 1704067260], 1704067200)
+        ['5 hours ago', 'in 1 minute']
+    """
+    ref = _to_timestamp(reference) if reference is not None else None
+
+    # Labels depend only on the difference, so repeated differences are
+    # formatted once.
+    by_diff: Dict[float, str] = {}
+    encoder = _LabelEncoder() if encoded else None
+    results = []
+    for timestamp in timestamps:
+        ts = _to_timestamp(timestamp)
+        diff = ref - ts if ref is not None else 0.0
+        label = by_diff.get(diff)
+        if label is None:
+            label = by_diff[diff] = _timeago_label(diff)
+        if encoder is not None:
+            encoder.add(label)
+        else:
+            results.append(label)
+
+    return encoder.result() if encoder is not None else results
+
+
+def human_date_many(timestamps: Iterable[Union[int, float, str, datetime]],
+                    reference: Optional[Union[int, float, str, datetime]] = None,
+                    timezone: Optional[str] = None,
+                    encoded: bool = False):
+    """Apply ``human_date`` to many timestamps sharing one reference.
+
+    Args:
+        timestamps: Iterable of timestamps (any type ``human_date`` accepts)
+        reference: The shared reference date (defaults to each timestamp)
+        timezone: IANA timezone name. If None, uses UTC (default).
+        encoded: If True, return an ``EncodedLabels`` instead of a list
+
+    Returns:
+        A list of strings, or an ``EncodedLabels`` when ``encoded`` is True
+
+    Examples:
+        >>> human_date_many([1705190400, 1705276800], 1705276800)
+        ['Yesterday', 'Today']
+
+    A numeric NumPy array is labelled with array operations instead of a
+    per-item loop; see ``_human_date_array``.
+    """
+    _resolve_tz(timezone)
+    if np is not None and isinstance(timestamps, np.ndarray) and timestamps.dtype.kind in 'iuf':
+        return _human_date_array(timestamps, reference, timezone, encoded)
+    stamps = [_whole_seconds(_to_timestamp(t)) for t in timestamps]
+    if reference is None:
+        labels = ["Today"] * len(stamps)
+        return encode_labels(labels) if encoded else labels
+    ref = _whole_seconds(_to_timestamp(reference))
+
+    # Local days come from a bisect into the zone's offset intervals plus
+    # an integer add; each distinct day is formatted once.
+    table = _offset_table(timezone, min(min(stamps, default=ref), ref),
+                          max(max(stamps, default=ref), ref), ref)
+    starts, offsets, lo, hi = table.starts, table.offsets, table.lo, table.hi
+    ref_date = _day_to_date(table.local_day(ref))
+    by_day: Dict[int, str] = {}
+    encoder = _LabelEncoder() if encoded else None
+    results = []
+    for seconds in stamps:
+        if lo <= seconds <= hi:
+            day = (seconds + offsets[bisect_right(starts, seconds) - 1]) // 86400
+        else:
+            day = table.local_day(seconds)
+        label = by_day.get(day)
+        if label is None:
+            label = by_day[day] = _human_date_label(_day_to_date(day), ref_date)
+        if encoder is not None:
+            encoder.add(label)
+        else:
+            results.append(label)
+
+    return encoder.result() if encoder is not None else results
+
+
+# Fixed labels for the first five kinds: Today, Yesterday, Tomorrow, then
+# "Last <weekday>" and "This <weekday>" from Monday (1970-01-05) to Sunday
+_WEEKDAY_NAMES = tuple(_day_to_date(4 + i).strftime('%A') for i in range(7))
+_FIXED_HUMAN_DATE_LABELS = (("Today", "Yesterday", "Tomorrow")
+                            + tuple(f"Last {name}" for name in _WEEKDAY_NAMES)
+                            + tuple(f"This {name}" for name in _WEEKDAY_NAMES))
+
+
+def _human_date_array(timestamps, reference, timezone: Optional[str], encoded: bool):
+    """``human_date_many`` for a numeric NumPy array, using array masks.
+
+    Whole seconds are derived exactly as ``_whole_seconds`` does. Local
+    days come from a ``searchsorted`` into the zone's offset intervals.
+    Today, Yesterday, Tomorrow and the Last/This weekday labels (day
+    differences -6..-2 and 2..6) are assigned by mask, and only the
+    remaining dates are formatted, once per distinct day.
+    """
+    values = timestamps.ravel()
+    if values.dtype.kind == 'f':
+        finite = np.isfinite(values)
+        if not finite.all():
+            # Raise exactly what the scalar path raises
+            _whole_seconds(float(values[np.argmin(finite)]))
+    if reference is None:
+        labels = ["Today"] * timestamps.size
+        return encode_labels(labels) if encoded else labels
+    if values.dtype.kind == 'f':
+        frac, whole = np.modf(values)
+        micros = np.round(frac * 1e6)
+        seconds = (whole.astype(np.int64) + (micros >= 1000000)
+                   - (micros < 0)).astype(np.int64)
+    else:
+        seconds = values.astype(np.int64)
+    ref = _whole_seconds(_to_timestamp(reference))
+
+    lo = min(int(seconds.min()), ref) if seconds.size else ref
+    hi = max(int(seconds.max()), ref) if seconds.size else ref
+    table = _offset_table(timezone, lo, hi, ref)
+    starts = np.asarray(table.starts, dtype=np.int64)
+    offsets = np.asarray(table.offsets, dtype=np.int64)
+    days = (seconds + offsets[np.searchsorted(starts, seconds, side='right') - 1]) // 86400
+    outside = np.flatnonzero((seconds < table.lo) | (seconds > table.hi))
+    if outside.size:
+        days[outside] = [table.local_day(value) for value in seconds[outside].tolist()]
+    ref_day = table.local_day(ref)
+    # Dates past year 9999 raise here, as in the scalar path, even for
+    # labels the masks below would assign without building a date
+    ref_date = _day_to_date(ref_day)
+    if days.size:
+        _day_to_date(int(days.min()))
+        _day_to_date(int(days.max()))
+    diff = days - ref_day
+
+    # Monday is 0; day 0 (1970-01-01) was a Thursday
+    weekday = (days + 3) % 7
+    codes = np.select(
+        [diff == 0, diff == -1, diff == 1,
+         (diff >= -6) & (diff <= -2), (diff >= 2) & (diff <= 6)],
+        [0, 1, 2, 3 + weekday, 10 + weekday],
+        default=-1)
+    labels = list(_FIXED_HUMAN_DATE_LABELS)
+    far = codes < 0
+    if far.any():
+        far_days, inverse = np.unique(days[far], return_inverse=True)
+        labels.extend(_human_date_label(_day_to_date(int(day)), ref_date) for day in far_days)
+        codes[far] = len(_FIXED_HUMAN_DATE_LABELS) + inverse
+
+    if encoded:
+        used, compact = np.unique(codes, return_inverse=True)
+        return EncodedLabels(array('I', compact.astype(np.uint32).tobytes()),
+                             [labels[code] for code in used])
+    return np.asarray(labels, dtype=object)[codes].tolist()
+
+
+def date_range_many(ranges: Iterable[tuple],
+                    timezone: Optional[str] = None) -> List[str]:
+    """Apply ``date_range`` to many (start, end) pairs in one timezone.
+
+    Args:
+        ranges: Iterable of (start, end) pairs (any types ``date_range`` accepts)
+        timezone: IANA timezone name. If None, uses UTC (default).
+
+    Returns:
+        A list of formatted date range strings, in input order
+
+    Examples:
+        >>> date_range_many([(1705276800, 1705881600), (1705881600, 1705276800)])
+        ['January 15–22, 2024', 'January 15–22, 2024']
+    """
+    _resolve_tz(timezone)
+    pairs = []
+    for start, end in ranges:
+        start_ts = _to_timestamp(start)
+        end_ts = _to_timestamp(end)
+        # Auto-correct if swapped
+        if start_ts > end_ts:
+            start_ts, end_ts = end_ts, start_ts
+        pairs.append((_whole_seconds(start_ts), _whole_seconds(end_ts)))
+    if not pairs:
+        return []
+
+    table = _offset_table(timezone, min(p[0] for p in pairs), max(p[1] for p in pairs),
+                          pairs[0][0])
+    local_day = table.local_day
+    by_days: Dict[tuple, str] = {}
+    results = []
+    for start_s, end_s in pairs:
+        days = (local_day(start_s), local_day(end_s))
+        label = by_days.get(days)
+        if label is None:
+            label = by_days[days] = _date_range_label(
+                _day_to_date(days[0]), _day_to_date(days[1]))
+        results.append(label)
+    return results
+
+
+def coalesce_date_ranges(ranges: Iterable[tuple],
+                         timezone: Optional[str] = None,
+                         gap_days: int = 0) -> List[str]:
+    """Merge overlapping (start, end) intervals and format the result.
+
+    Intervals are compared by local calendar day, so two intervals merge
+    when they overlap or share a local day. Pass ``gap_days=1`` to also
+    merge intervals on consecutive days. Swapped pairs are auto-corrected,
+    as in ``date_range``.
+
+    Args:
+        ranges: Iterable of (start, end) pairs, in any order
+        timezone: IANA timezone name. If None, uses UTC (default).
+        gap_days: Days allowed between merged intervals (default 0)
+
+    Returns:
+        ``date_range`` strings for the merged intervals, in date order
+
+    Examples:
+        >>> coalesce_date_ranges([(1705881600, 1705276800), (1705363200, 1705968000),
+        ...                       (1706745600, 1706745600)])
+        ['January 15–23, 2024', 'February 1, 2024']
+    """
+    _resolve_tz(timezone)
+    pairs = set()
+    for start, end in ranges:
+        start_ts = _to_timestamp(start)
+        end_ts = _to_timestamp(end)
+        # Auto-correct if swapped
+        if start_ts > end_ts:
+            start_ts, end_ts = end_ts, start_ts
+        pairs.add((_whole_seconds(start_ts), _whole_seconds(end_ts)))
+    if not pairs:
+        return []
+
+    table = _offset_table(timezone, min(p[0] for p in pairs), max(p[1] for p in pairs),
+                          next(iter(pairs))[0])
+    local_day = table.local_day
+    days = set()
+    for start_s, end_s in pairs:
+        first, last = local_day(start_s), local_day(end_s)
+        # A fall-back across midnight can put the end on an earlier day
+        days.add((first, last) if first <= last else (last, first))
+
+    merged = []
+    for first, last in sorted(days):
+        if merged and first <= merged[-1][1] + gap_days:
+            if last > merged[-1][1]:
+                merged[-1][1] = last
+        else:
+            merged.append([first, last])
+    return [_date_range_label(_day_to_date(first), _day_to_date(last))
+            for first, last in merged]
+
+
+# =============================================================================
+# Streaming record enrichment
+# =============================================================================
+
+def _map_distinct(func, values: List[Any]) -> List[Any]:
+    """Apply ``func`` to each distinct value once and map results back."""
+    results: Dict[Any, Any] = {}
+    return [results[v] if v in results else results.setdefault(v, func(v))
+            for v in values]
+
+
+def _enrich_batch(name: str, values: List[Any], options: Optional[Dict[str, Any]],
+                  reference, timezone: Optional[str]) -> List[Any]:
+    """Run one whenwords function over a batch of field values."""
+    if name == 'timeago':
+        return timeago_many(values, reference)
+    if name == 'human_date':
+        return human_date_many(values, reference, timezone)
+    if name == 'duration':
+        return _map_distinct(lambda v: duration(v, options), values)
+    return _map_distinct(parse_duration, values)
+
+
+def _enrich_one(name: str, value: Any, options: Optional[Dict[str, Any]],
+                reference, timezone: Optional[str]) -> Any:
+    if name == 'timeago':
+        return timeago(value, reference)
+    if name == 'human_date':
+        return human_date(value, reference, timezone)
+    if name == 'duration':
+        return duration(value, options)
+    return parse_duration(value)
+
+
+# What a wrong or wrongly typed field value raises; 'null' mode absorbs all three
+_ENRICH_ERRORS = (ValueError, TypeError, AttributeError)
+
+# Marks a record that isn't a JSON object, passed through as it came
+_UNCHANGED = object()
+
+_ENRICH_FUNCTIONS = {
+    'timeago': 'timeago', timeago: 'timeago',
+    'human_date': 'human_date', human_date: 'human_date',
+    'duration': 'duration', duration: 'duration',
+    'parse_duration': 'parse_duration', parse_duration: 'parse_duration',
+}
+
+
+def enrich(records: Iterable[Union[Dict[str, Any], str, bytes]],
+           fields: Dict[str, tuple],
+           reference: Optional[Union[int, float, str, datetime]] = None,
+           timezone: Optional[str] = None,
+           batch_size: int = 1000,
+           errors: str = 'raise'):
+    """Add whenwords fields to a stream of JSON records.
+
+    Records are read ``batch_size`` at a time and each field is computed
+    with one batch call, so memory stays bounded however long the stream is.
+
+    Args:
+        records: Iterable of dicts, or of JSON lines (str or bytes)
+        fields: Mapping of output field to ``(source_field, function)`` or
+                ``(source_field, function, options)``. ``function`` is one of
+                ``timeago``, ``human_date``, ``duration`` or ``parse_duration``
+                (the function or its name); ``options`` is passed to ``duration``.
+        reference: Reference time for ``timeago`` and ``human_date``
+        timezone: IANA timezone name for ``human_date``. If None, uses UTC.
+        batch_size: Number of records processed per batch
+        errors: ``'raise'`` to raise on an invalid or wrongly typed value,
+                and ValueError on a record that isn't a JSON object; or
+                ``'null'`` to set that output field to None and pass such
+                records through unchanged
+
+    Yields:
+        Each record with the output fields added. Dicts are updated in place
+        and yielded; JSON lines are yielded as JSON lines. Records where the
+        source field is missing or null are left without the output field.
+
+    Examples:
+        >>> rows = [{'ts': 1704049200, 'elapsed': 125}]
+        >>> fields = {'age': ('ts', 'timeago'),
+        ...           'took': ('elapsed', 'duration', {'compact': True})}
+        >>> list(enrich(rows, fields, reference=1704067200))
+        [{'ts': 1704049200, 'elapsed': 125, 'age': '5 hours ago', 'took': '2m 5s'}]
+    """
+    if errors not in ('raise', 'null'):
+        raise ValueError(f"Invalid errors mode: {errors}")
+    if batch_size < 1:
+        raise ValueError("Batch size must be positive")
+
+    specs = []
+    for output, spec in fields.items():
+        source, func = spec[0], spec[1]
+        options = spec[2] if len(spec) > 2 else None
+        try:
+            name = _ENRICH_FUNCTIONS[func]
+        except (KeyError, TypeError):
+            raise ValueError(f"Unsupported enrichment function: {func}") from None
+        specs.append((output, source, name, options))
+
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+
+        # Parse JSON lines, remembering which records to serialize back
+        rows = []
+        for record in batch:
+            row, newline = record, None
+            if isinstance(row, (str, bytes)):
+                # Undecodable bytes and invalid JSON both raise ValueError
+                try:
+                    if isinstance(row, bytes):
+                        row = row.decode('utf-8')
+                    if not row.strip():
+                        continue
+                    newline = "\n" if row.endswith("\n") else ""
+                    row = json.loads(row)
+                except ValueError:
+                    row = None
+            if not isinstance(row, dict):
+                if errors == 'raise':
+                    raise ValueError(f"Record is not a JSON object: {record!r:.80}")
+                rows.append((record, _UNCHANGED))
+                continue
+            rows.append((row, newline))
+
+        for output, source, name, options in specs:
+            present = [row for row, newline in rows
+                       if newline is not _UNCHANGED and row.get(source) is not None]
+            values = [row[source] for row in present]
+            try:
+                results = _enrich_batch(name, values, options, reference, timezone)
+            except _ENRICH_ERRORS:
+                if errors == 'raise':
+                    raise
+                results = []
+                for value in values:
+                    try:
+                        results.append(_enrich_one(name, value, options, reference, timezone))
+                    except _ENRICH_ERRORS:
+                        results.append(None)
+            for row, result in zip(present, results):
+                row[output] = result
+
+        for row, newline in rows:
+            if newline is None or newline is _UNCHANGED:
+                yield row
+            else:
+                yield json.dumps(row, ensure_ascii=False) + newline
+
+
+# =============================================================================
+# Structured results
+# =============================================================================
+
+# Units timeago reports; 'now' is the "just now" bucket
+TIMEAGO_UNITS = ('now', 'minute', 'hour', 'day', 'month', 'year')
+
+
+class TimeagoParts(NamedTuple):
+    """The numbers behind a ``timeago`` string."""
+    n: int
+    unit: str
+    is_future: bool
+
+
+class DurationParts(NamedTuple):
+    """Per-unit counts ``duration`` displays (zero for units not shown)."""
+    years: int
+    months: int
+    days: int
+    hours: int
+    minutes: int
+    seconds: int
+
+
+class HumanDateParts(NamedTuple):
+    """The day difference and layout behind a ``human_date`` string."""
+    day_diff: int
+    kind: str
+    year: int
+    month: int
+    day: int
+    weekday: int
+
+
+class DateRangeParts(NamedTuple):
+    """The layout and local dates behind a ``date_range`` string."""
+    layout: str
+    start_year: int
+    start_month: int
+    start_day: int
+    end_year: int
+    end_month: int
+    end_day: int
+
+
+class TimeagoColumns(NamedTuple):
+    """Parallel arrays of timeago parts; ``unit`` indexes TIMEAGO_UNITS."""
+    n: array
+    unit: array
+    is_future: array
+
+
+class DurationColumns(NamedTuple):
+    """Parallel arrays of duration unit counts."""
+    years: array
+    months: array
+    days: array
+    hours: array
+    minutes: array
+    seconds: array
+
+
+class HumanDateColumns(NamedTuple):
+    """Parallel arrays of human_date parts; ``kind`` indexes HUMAN_DATE_KINDS."""
+    day_diff: array
+    kind: array
+    year: array
+    month: array
+    day: array
+    weekday: array
+
+
+class DateRangeColumns(NamedTuple):
+    """Parallel arrays of date_range parts; ``layout`` indexes DATE_RANGE_LAYOUTS."""
+    layout: array
+    start_year: array
+    start_month: array
+    start_day: array
+    end_year: array
+    end_month: array
+    end_day: array
+
+
+_TIMEAGO_UNIT_INDEX = {unit: index for index, unit in enumerate(TIMEAGO_UNITS)}
+
+
+def _timeago_count(diff: float) -> tuple:
+    """(bucket, n) for a reference-minus-timestamp difference."""
+    abs_diff = -diff if diff < 0 else diff
+    bucket = bisect_right(_TIMEAGO_THRESHOLDS, abs_diff)
+    if bucket == 0:
+        return 0, 0
+    divisor = _TIMEAGO_RULES[bucket][1]
+    return bucket, round(abs_diff / divisor) if divisor else 1
+
+
+def timeago_parts(timestamp: Union[int, float, str, datetime],
+                  reference: Optional[Union[int, float, str, datetime]] = None) -> TimeagoParts:
+    """Return the count, unit and direction ``timeago`` would format.
+
+    "just now" is reported as ``n=0, unit='now'``.
+
+    Examples:
+        >>> timeago_parts(1704049200, 1704067200)
+        TimeagoParts(n=5, unit='hour', is_future=False)
+    """
+    ts = _to_timestamp(timestamp)
+    ref = _to_timestamp(reference) if reference is not None else ts
+    diff = ref - ts
+    bucket, n = _timeago_count(diff)
+    return TimeagoParts(n, _TIMEAGO_RULES[bucket][0], diff < 0)
+
+
+def duration_parts(seconds: Union[int, float],
+                   options: Optional[Dict[str, Any]] = None) -> DurationParts:
+    """Return the per-unit counts ``duration`` would format.
+
+    Only ``max_units`` from ``options`` applies; rounding of the last
+    displayed unit is included.
+
+    Examples:
+        >>> duration_parts(9000, {'max_units': 1})
+        DurationParts(years=0, months=0, days=0, hours=3, minutes=0, seconds=0)
+    """
+    if seconds < 0 or math.isnan(seconds) or math.isinf(seconds):
+        raise ValueError("Duration must be non-negative and finite")
+    max_units = (options or {}).get('max_units', _DURATION_MAX_UNITS)
+
+    counts = [0] * len(_DURATION_UNITS)
+    for index, count in _duration_counts(seconds, max_units):
+        counts[index] = count
+    return DurationParts(*counts)
+
+
+def _human_date_parts(dt_date: date, ref_date: date) -> HumanDateParts:
+    day_diff = (dt_date - ref_date).days
+    kind = _human_date_kind(day_diff, dt_date.year == ref_date.year)
+    return HumanDateParts(day_diff, HUMAN_DATE_KINDS[kind], dt_date.year,
+                          dt_date.month, dt_date.day, dt_date.weekday())
+
+
+def human_date_parts(timestamp: Union[int, float, str, datetime],
+                     reference: Optional[Union[int, float, str, datetime]] = None,
+                     timezone: Optional[str] = None) -> HumanDateParts:
+    """Return the day difference, layout and local date behind ``human_date``.
+
+    ``weekday`` counts from Monday as 0.
+
+    Examples:
+        >>> human_date_parts(1705190400, 1705276800)
+        HumanDateParts(day_diff=-1, kind='yesterday', year=2024, month=1, day=14, weekday=6)
+    """
+    ts = _to_timestamp(timestamp)
+    ref = _to_timestamp(reference) if reference is not None else ts
+    tz = _resolve_tz(timezone)
+    dt = datetime.fromtimestamp(ts, tz=tz)
+    ref_dt = datetime.fromtimestamp(ref, tz=tz)
+    return _human_date_parts(dt.date(), ref_dt.date())
+
+
+def _date_range_parts(start_date: date, end_date: date) -> DateRangeParts:
+    layout = _date_range_layout(start_date, end_date)
+    return DateRangeParts(DATE_RANGE_LAYOUTS[layout],
+                          start_date.year, start_date.month, start_date.day,
+                          end_date.year, end_date.month, end_date.day)
+
+
+def date_range_parts(start: Union[int, float, str, datetime],
+                     end: Union[int, float, str, datetime],
+                     timezone: Optional[str] = None) -> DateRangeParts:
+    """Return the layout and local dates behind ``date_range``.
+
+    Swapped inputs are auto-corrected, as in ``date_range``.
+
+    Examples:
+        >>> date_range_parts(1705276800, 1705881600).layout
+        'same_month'
+    """
+    start_ts = _to_timestamp(start)
+    end_ts = _to_timestamp(end)
+    if start_ts > end_ts:
+        start_ts, end_ts = end_ts, start_ts
+    tz = _resolve_tz(timezone)
+    return _date_range_parts(datetime.fromtimestamp(start_ts, tz=tz).date(),
+                             datetime.fromtimestamp(end_ts, tz=tz).date())
+
+
+def timeago_parts_many(timestamps: Iterable[Union[int, float, str, datetime]],
+                       reference: Optional[Union[int, float, str, datetime]] = None) -> TimeagoColumns:
+    """Apply ``timeago_parts`` to many timestamps, returning parallel arrays."""
+    ref = _to_timestamp(reference) if reference is not None else None
+    columns = TimeagoColumns(array('q'), array('B'), array('B'))
+    unit_of_bucket = [_TIMEAGO_UNIT_INDEX[unit] for unit, _ in _TIMEAGO_RULES]
+    for timestamp in timestamps:
+        diff = ref - _to_timestamp(timestamp) if ref is not None else 0.0
+        bucket, n = _timeago_count(diff)
+        columns.n.append(n)
+        columns.unit.append(unit_of_bucket[bucket])
+        columns.is_future.append(diff < 0)
+    return columns
+
+
+def duration_parts_many(values: Iterable[Union[int, float]],
+                        options: Optional[Dict[str, Any]] = None) -> DurationColumns:
+    """Apply ``duration_parts`` to many values, returning parallel arrays."""
+    columns = DurationColumns(*(array('q') for _ in _DURATION_UNITS))
+    for seconds in values:
+        for column, count in zip(columns, duration_parts(seconds, options)):
+            column.append(count)
+    return columns
+
+
+def human_date_parts_many(timestamps: Iterable[Union[int, float, str, datetime]],
+                          reference: Optional[Union[int, float, str, datetime]] = None,
+                          timezone: Optional[str] = None) -> HumanDateColumns:
+    """Apply ``human_date_parts`` to many timestamps, returning parallel arrays.
+
+    Uses the same per-zone offset tables as ``human_date_many``.
+    """
+    _resolve_tz(timezone)
+    stamps = [_whole_seconds(_to_timestamp(t)) for t in timestamps]
+    columns = HumanDateColumns(array('q'), array('B'), array('i'),
+                               array('B'), array('B'), array('B'))
+    if not stamps:
+        return columns
+    ref = _whole_seconds(_to_timestamp(reference)) if reference is not None else None
+    span = stamps if ref is None else stamps + [ref]
+    table = _offset_table(timezone, min(span), max(span), span[-1])
+    ref_day = table.local_day(ref) if ref is not None else None
+
+    by_day: Dict[int, tuple] = {}
+    for seconds in stamps:
+        day = table.local_day(seconds)
+        row = by_day.get(day)
+        if row is None:
+            dt_date = _day_to_date(day)
+            ref_date = dt_date if ref_day is None else _day_to_date(ref_day)
+            parts = _human_date_parts(dt_date, ref_date)
+            row = by_day[day] = parts._replace(kind=HUMAN_DATE_KINDS.index(parts.kind))
+        for column, value in zip(columns, row):
+            column.append(value)
+    return columns
+
+
+def date_range_parts_many(ranges: Iterable[tuple],
+                          timezone: Optional[str] = None) -> DateRangeColumns:
+    """Apply ``date_range_parts`` to many (start, end) pairs, returning parallel arrays."""
+    _resolve_tz(timezone)
+    columns = DateRangeColumns(array('B'), array('i'), array('B'), array('B'),
+                               array('i'), array('B'), array('B'))
+    pairs = []
+    for start, end in ranges:
+        start_ts = _to_timestamp(start)
+        end_ts = _to_timestamp(end)
+        if start_ts > end_ts:
+            start_ts, end_ts = end_ts, start_ts
+        pairs.append((_whole_seconds(start_ts), _whole_seconds(end_ts)))
+    if not pairs:
+        return columns
+
+    table = _offset_table(timezone, min(p[0] for p in pairs), max(p[1] for p in pairs),
+                          pairs[0][0])
+    for start_s, end_s in pairs:
+        start_date = _day_to_date(table.local_day(start_s))
+        end_date = _day_to_date(table.local_day(end_s))
+        layout = _date_range_layout(start_date, end_date)
+        row = (layout, start_date.year, start_date.month, start_date.day,
+               end_date.year, end_date.month, end_date.day)
+        for column, value in zip(columns, row):
+            column.append(value)
+    return columns
+
+
+# =============================================================================
+# Reference-bound rendering
+# =============================================================================
+
+class Renderer:
+    """Formats many values against one fixed reference and timezone.
+
+    Everything derived from the reference is computed once: the resolved
+    timezone, the reference's local date and year, the local midnights of
+    the surrounding days, and the labels for the days within a week of it.
+    Methods then only do per-item work, and return exactly what the module
+    functions return.
+
+    Examples:
+        >>> page = Renderer(1705276800, timezone="Europe/London")
+        >>> page.timeago(1705262400), page.human_date(1705190400)
+        ('4 hours ago', 'Yesterday')
+    """
+
+    # Days either side of the reference with a precomputed label and midnight
+    WINDOW_DAYS = 7
+
+    # Bound on the per-day label cache for dates outside the window
+    MAX_CACHED_DAYS = 4096
+
+    def __init__(self, reference: Union[int, float, str, datetime],
+                 timezone: Optional[str] = None):
+        self.reference = _to_timestamp(reference)
+        self.timezone = timezone
+        _resolve_tz(timezone)
+
+        ref_seconds = _whole_seconds(self.reference)
+        window = (self.WINDOW_DAYS + 5) * 86400
+        self._table = _offset_table(timezone, ref_seconds - window, ref_seconds + window)
+        self.reference_day = self._table.local_day(ref_seconds)
+        self.reference_date = _day_to_date(self.reference_day)
+        self.reference_year = self.reference_date.year
+
+        first_day = self.reference_day - self.WINDOW_DAYS
+        self._first_day = first_day
+        self._midnights = self._local_midnights(first_day, self.reference_day + self.WINDOW_DAYS + 1)
+        self._near_labels = tuple(
+            _human_date_label(_day_to_date(day), self.reference_date)
+            for day in range(first_day, self.reference_day + self.WINDOW_DAYS + 1))
+        self._day_labels: Dict[int, str] = {}
+        self._range_labels: Dict[tuple, str] = {}
+
+    def _local_midnights(self, first_day: int, last_day: int) -> Optional[List[int]]:
+        """Unix seconds at which each local day in [first_day, last_day] starts.
+
+        Returns None if the local day ever steps backwards in the window (a
+        fall-back transition across midnight), where boundaries can't be
+        bisected; lookups then use the offset table directly.
+        """
+        table = self._table
+        if table.day_steps_back(table.lo, table.hi):
+            return None
+
+        midnights = []
+        for day in range(first_day, last_day + 1):
+            before, after = day * 86400 - 2 * 86400, day * 86400 + 2 * 86400
+            while after - before > 1:
+                middle = (before + after) // 2
+                if table.local_day(middle) >= day:
+                    after = middle
+                else:
+                    before = middle
+            midnights.append(after)
+        return midnights
+
+    def _local_day(self, seconds: int) -> int:
+        midnights = self._midnights
+        if midnights is not None and midnights[0] <= seconds < midnights[-1]:
+            return self._first_day + bisect_right(midnights, seconds) - 1
+        return self._table.local_day(seconds)
+
+    def _day_label(self, day: int) -> str:
+        offset = day - self._first_day
+        if 0 <= offset < len(self._near_labels):
+            return self._near_labels[offset]
+        label = self._day_labels.get(day)
+        if label is None:
+            label = _human_date_label(_day_to_date(day), self.reference_date)
+            if len(self._day_labels) < self.MAX_CACHED_DAYS:
+                self._day_labels[day] = label
+        return label
+
+    def timeago(self, timestamp: Union[int, float, str, datetime]) -> str:
+        """``timeago(timestamp, reference)``."""
+        return _timeago_label(self.reference - _to_timestamp(timestamp))
+
+    def human_date(self, timestamp: Union[int, float, str, datetime]) -> str:
+        """``human_date(timestamp, reference, timezone)``."""
+        return self._day_label(self._local_day(_whole_seconds(_to_timestamp(timestamp))))
+
+    def date_range(self, start: Union[int, float, str, datetime],
+                   end: Union[int, float, str, datetime]) -> str:
+        """``date_range(start, end, timezone)``."""
+        start_ts = _to_timestamp(start)
+        end_ts = _to_timestamp(end)
+        # Auto-correct if swapped
+        if start_ts > end_ts:
+            start_ts, end_ts = end_ts, start_ts
+        days = (self._local_day(_whole_seconds(start_ts)),
+                self._local_day(_whole_seconds(end_ts)))
+        label = self._range_labels.get(days)
+        if label is None:
+            label = _date_range_label(_day_to_date(days[0]), _day_to_date(days[1]))
+            if len(self._range_labels) < self.MAX_CACHED_DAYS:
+                self._range_labels[days] = label
+        return label
+
+
+# =============================================================================
+# Bulk ISO 8601 parsing
+# =============================================================================
+
+class ParsedColumn(NamedTuple):
+    """Unix seconds for a column of timestamps, with an error mask.
+
+    ``timestamps[i]`` is NaN wherever ``errors[i]`` is 1. ``layout`` names
+    the sniffed layout the fast parser was compiled for, or is None.
+    """
+    timestamps: array
+    errors: array
+    layout: Optional[str]
+
+
+_ISO_SHAPE = re.compile(
+    r'\d{4}-\d{2}-\d{2}([T ])\d{2}:\d{2}(:\d{2}(?:\.(\d{1,6}))?)?(Z|[+-]\d{2}:\d{2})')
+
+
+def _iso_layout(value: str) -> Optional[tuple]:
+    """(separator, has_seconds, fraction_digits, zulu) for an offset-carrying ISO string."""
+    match = _ISO_SHAPE.fullmatch(value)
+    if match is None:
+        return None
+    separator, seconds, fraction, zone = match.groups()
+    return (separator, seconds is not None, len(fraction) if fraction else 0, zone == 'Z')
+
+
+def _describe_iso_layout(layout: tuple) -> str:
+    separator, has_seconds, fraction_digits, zulu = layout
+    text = f"YYYY-MM-DD{separator}HH:MM"
+    if has_seconds:
+        text += ":SS"
+    if fraction_digits:
+        text += "." + "f" * fraction_digits
+    return text + ("Z" if zulu else "+HH:MM")
+
+
+def _iso_offset(zone: str) -> Optional[int]:
+    """UTC offset in seconds of a validated "Z" or "+HH:MM" suffix, else None."""
+    if zone == 'Z':
+        return 0
+    sign, hours, minutes = zone[:1], zone[1:3], zone[4:6]
+    if not (len(zone) == 6 and zone.isascii() and sign in ('+', '-') and zone[3] == ':'
+            and hours.isdigit() and minutes.isdigit()):
+        return None
+    if int(hours) > 23 or int(minutes) > 59:
+        return None
+    return (int(hours) * 3600 + int(minutes) * 60) * (1 if sign == '+' else -1)
+
+
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_UTC_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_FROMISOFORMAT_ZULU = sys.version_info >= (3, 11)
+
+# Values are parsed in chunks; a chunk with an invalid value is redone per value
+_ISO_CHUNK = 4096
+
+
+def _compile_iso_parser(layout: tuple):
+    """Build a column parser specialized to one ISO 8601 layout.
+
+    Returns ``(length, parse_column)``. ``parse_column`` takes a list of
+    strings of exactly ``length`` characters and returns their Unix seconds,
+    exactly as ``_to_timestamp`` would. It raises ValueError or TypeError if
+    any value doesn't fit.
+
+    The zone suffix sits at a fixed offset, so it is sliced off and each
+    distinct suffix is validated once. The local part is parsed as a naive
+    datetime and measured from an epoch shifted by the suffix's offset,
+    which avoids creating a tzinfo per value. The per-value loops are
+    ``map`` calls, so they run in C.
+    """
+    separator, has_seconds, fraction_digits, zulu = layout
+    zone_at = 16 + (3 if has_seconds else 0) + (1 + fraction_digits if fraction_digits else 0)
+    length = zone_at + (1 if zulu else 6)
+    take_local = itemgetter(slice(0, zone_at))
+    take_zone = itemgetter(slice(zone_at, None))
+    epochs: Dict[str, Optional[datetime]] = {'Z': _NAIVE_EPOCH}
+
+    def parse_column(values: List[str]) -> List[float]:
+        zones = list(map(take_zone, values))
+        if zulu and zones.count('Z') == len(values):
+            if _FROMISOFORMAT_ZULU:
+                # The C parser reads "Z" itself and reuses the UTC singleton
+                aware = map(datetime.fromisoformat, values)
+                return list(map(timedelta.total_seconds, map(sub, aware, repeat(_UTC_EPOCH))))
+            shifted = repeat(_NAIVE_EPOCH)
+        else:
+            for zone in set(zones).difference(epochs):
+                offset = _iso_offset(zone)
+                epochs[zone] = (None if offset is None
+                                else _NAIVE_EPOCH + timedelta(seconds=offset))
+            shifted = map(epochs.__getitem__, zones)
+        local = map(datetime.fromisoformat, map(take_local, values))
+        # Same arithmetic as datetime.timestamp() on the aware value
+        return list(map(timedelta.total_seconds, map(sub, local, shifted)))
+
+    return length, parse_column
+
+
+def parse_iso_column(values: Iterable[Union[int, float, str, datetime]],
+                     sample_size: int = 64) -> ParsedColumn:
+    """Parse a column of timestamps, compiling a fast parser for its ISO layout.
+
+    The layout is sniffed from the first ``sample_size`` strings, and the
+    most common layout with a ``Z`` or ``+HH:MM`` suffix gets a specialized
+    fixed-position parser. Values that don't fit it (other layouts, naive
+    strings, numbers, datetimes) fall back to the same conversion the other
+    functions use. Invalid values are flagged in ``errors`` instead of
+    raising.
+
+    Examples:
+        >>> column = parse_iso_column(["2024-01-15T08:30:00Z", "soon", 1705307400])
+        >>> list(column.timestamps)[::2], list(column.errors), column.layout
+        ([1705307400.0, 1705307400.0], [0, 1, 0], 'YYYY-MM-DDTHH:MM:SSZ')
+    """
+    values = values if isinstance(values, (list, tuple)) else list(values)
+    if set(map(type, values)) <= {int, float}:
+        try:
+            return ParsedColumn(array('d', values), array('B', bytes(len(values))), None)
+        except OverflowError:
+            pass  # an int too large for a float; flag it below
+
+    counts: Dict[tuple, int] = {}
+    sampled = 0
+    for value in values:
+        if sampled >= sample_size:
+            break
+        if isinstance(value, str):
+            sampled += 1
+            layout = _iso_layout(value)
+            if layout is not None:
+                counts[layout] = counts.get(layout, 0) + 1
+    layout = max(counts, key=counts.get) if counts else None
+    results: List[Optional[float]] = [None] * len(values)
+    if layout is not None:
+        length, parse_column = _compile_iso_parser(layout)
+        if set(map(type, values)) <= {str} and \
+                list(map(len, values)).count(length) == len(values):
+            # Every value fits: parse contiguous slices in place
+            for start in range(0, len(values), _ISO_CHUNK):
+                stop = start + _ISO_CHUNK
+                try:
+                    results[start:stop] = parse_column(values[start:stop])
+                except (ValueError, TypeError):
+                    pass
+        else:
+            fits = [i for i, value in enumerate(values)
+                    if type(value) is str and len(value) == length]
+            for start in range(0, len(fits), _ISO_CHUNK):
+                chunk = fits[start:start + _ISO_CHUNK]
+                try:
+                    parsed = parse_column([values[i] for i in chunk])
+                except (ValueError, TypeError):
+                    continue
+                for i, result in zip(chunk, parsed):
+                    results[i] = result
+
+    # Anything left unparsed goes through the scalar conversion
+    errors = array('B', bytes(len(values)))
+    if None in results:
+        for index, result in enumerate(results):
+            if result is None:
+                try:
+                    results[index] = _to_timestamp(values[index])
+                except (ValueError, OverflowError):
+                    results[index] = math.nan
+                    errors[index] = 1
+
+    return ParsedColumn(array('d', results), errors,
+                        _describe_iso_layout(layout) if layout is not None else None)
+
+
+# =============================================================================
+# Run-length results for sorted input
+# =============================================================================
+
+class LabelRuns(NamedTuple):
+    """Run-length encoded labels: ``labels[i]`` repeats ``lengths[i]`` times.
+
+    Consecutive runs always have different labels.
+    """
+    labels: List[str]
+    lengths: array
+
+    def expand(self) -> List[str]:
+        """Return the per-item strings as a list."""
+        return list(chain.from_iterable(map(repeat, self.labels, self.lengths)))
+
+
+def _sorted_column(timestamps: Iterable[Union[int, float, str, datetime]]) -> tuple:
+    """(timestamps as array('d'), order) where order is 1, -1 or 0 (unsorted).
+
+    Raises the scalar ``ValueError`` for the first invalid timestamp.
+    """
+    values = timestamps if isinstance(timestamps, (list, tuple)) else list(timestamps)
+    column = parse_iso_column(values)
+    if 1 in column.errors:
+        _to_timestamp(values[column.errors.index(1)])
+    stamps = column.timestamps
+    if all(map(le, stamps, islice(stamps, 1, None))):
+        return stamps, 1
+    if all(map(ge, stamps, islice(stamps, 1, None))):
+        return stamps, -1
+    return stamps, 0
+
+
+def _runs_of(stamps: array, key) -> tuple:
+    """Run-length encode ``key`` over ascending ``stamps``.
+
+    ``key`` must take each value once over a contiguous stretch, which holds
+    for any non-decreasing function of time. From the start of each run, the
+    search gallops ahead until the key changes and then bisects back to the
+    boundary, so the work grows with the number of runs rather than items.
+    """
+    keys = []
+    lengths = array('Q')
+    i, n = 0, len(stamps)
+    while i < n:
+        k = key(stamps[i])
+        lo, step = i, 1
+        hi = i + 1
+        while hi < n and key(stamps[hi]) == k:
+            lo = hi
+            step *= 2
+            hi = lo + step
+        hi = min(hi, n)
+        # key(stamps[lo]) == k, and hi is either n or past the run
+        while hi - lo > 1:
+            middle = (lo + hi) // 2
+            if key(stamps[middle]) == k:
+                lo = middle
+            else:
+                hi = middle
+        keys.append(k)
+        lengths.append(hi - i)
+        i = hi
+    return keys, lengths
+
+
+def _encode_runs(labels: Iterable[str]) -> LabelRuns:
+    keys = []
+    lengths = array('Q')
+    for label, group in groupby(labels):
+        keys.append(label)
+        lengths.append(sum(1 for _ in group))
+    return LabelRuns(keys, lengths)
+
+
+def _ordered_runs(stamps: array, order: int, key) -> tuple:
+    """``_runs_of`` for ascending (1) or descending (-1) stamps."""
+    if order == 1:
+        return _runs_of(stamps, key)
+    keys, lengths = _runs_of(stamps[::-1], key)
+    keys.reverse()
+    lengths.reverse()
+    return keys, lengths
+
+
+def timeago_runs(timestamps: Iterable[Union[int, float, str, datetime]],
+                 reference: Optional[Union[int, float, str, datetime]] = None) -> LabelRuns:
+    """Apply ``timeago`` to time-ordered timestamps, as runs of equal labels.
+
+    Sorted input (ascending or descending, as log streams arrive) is labelled
+    in work proportional to the number of distinct labels, not items.
+    Unsorted input is detected and labelled item by item instead. Either
+    way ``expand()`` gives exactly what ``timeago_many`` returns.
+
+    Examples:
+        >>> runs = timeago_runs([1704049200, 1704049300, 1704067170, 1704067200], 1704067200)
+        >>> runs.labels, list(runs.lengths)
+        (['5 hours ago', 'just now'], [2, 2])
+    """
+    stamps, order = _sorted_column(timestamps)
+    if reference is None:
+        return _encode_runs(repeat("just now", len(stamps)))
+    ref = _to_timestamp(reference)
+    if order == 0:
+        return _encode_runs(timeago_many(stamps, ref))
+
+    # A label covers one contiguous stretch of differences
+    keys, lengths = _ordered_runs(stamps, order, lambda ts: _timeago_label(ref - ts))
+    return LabelRuns(keys, lengths)
+
+
+def human_date_runs(timestamps: Iterable[Union[int, float, str, datetime]],
+                    reference: Optional[Union[int, float, str, datetime]] = None,
+                    timezone: Optional[str] = None) -> LabelRuns:
+    """Apply ``human_date`` to time-ordered timestamps, as runs of equal labels.
+
+    For sorted input each run is one local day. Its end is found by
+    bisecting the input against local midnight, and its label is formatted
+    once. Unsorted input, or a zone whose local day steps backwards within
+    the span, is labelled item by item instead. Either way ``expand()``
+    gives exactly what ``human_date_many`` returns.
+
+    Examples:
+        >>> runs = human_date_runs([1705190400, 1705200000, 1705276800], 1705276800)
+        >>> runs.labels, list(runs.lengths)
+        (['Yesterday', 'Today'], [2, 1])
+    """
+    stamps, order = _sorted_column(timestamps)
+    _resolve_tz(timezone)
+    if reference is None or not stamps:
+        return _encode_runs(human_date_many(stamps, reference, timezone))
+    ref = _whole_seconds(_to_timestamp(reference))
+
+    first = _whole_seconds(min(stamps[0], stamps[-1]))
+    last = _whole_seconds(max(stamps[0], stamps[-1]))
+    table = _offset_table(timezone, min(first, ref), max(last, ref), ref)
+    if order == 0 or table.day_steps_back(first, last):
+        return _encode_runs(human_date_many(stamps, reference, timezone))
+
+    local_day = table.local_day
+    days, lengths = _ordered_runs(stamps, order, lambda ts: local_day(_whole_seconds(ts)))
+    ref_date = _day_to_date(table.local_day(ref))
+    return LabelRuns([_human_date_label(_day_to_date(day), ref_date) for day in days], lengths)
+
+
+# =============================================================================
+# Opt-in result caching
+# =============================================================================
+
+CACHEABLE_FUNCTIONS = ('timeago', 'duration', 'parse_duration', 'human_date', 'date_range')
+
+# Longer parse_duration inputs are never cached, so entries stay small
+_CACHE_MAX_KEY_LENGTH = 64
+
+_MISSING = object()
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+    ttl: Optional[float]
+
+
+class _ResultCache:
+    """A bounded result cache: LRU, or oldest-first with a time to live.
+
+    Never holds more than ``maxsize`` entries. With a ``ttl`` an entry is
+    served for ``ttl`` seconds after it was stored; expired entries are
+    dropped when looked up and swept from the front on every store.
+    """
+
+    __slots__ = ('maxsize', 'ttl', 'clock', 'entries', 'hits', 'misses', '_lock')
+
+    def __init__(self, maxsize: int, ttl: Optional[float], clock):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, key, compute, *args):
+        """Return the cached result for ``key``, or ``compute(*args)`` and store it."""
+        with self._lock:
+            entry = self.entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                if self.ttl is None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                expires, value = entry
+                if self.clock() < expires:
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+
+        # Exceptions propagate and nothing is stored
+        value = compute(*args)
+
+        with self._lock:
+            entries = self.entries
+            if self.ttl is None:
+                entries[key] = value
+            else:
+                now = self.clock()
+                # Entries are in store order, so the expired ones are in front
+                while entries and next(iter(entries.values()))[0] <= now:
+                    entries.popitem(last=False)
+                entries.pop(key, None)
+                entries[key] = (now + self.ttl, value)
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+        return value
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.entries), self.ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+
+# Function name -> cache, for the functions with caching enabled
+_CACHES: Dict[str, _ResultCache] = {}
+
+
+def _timeago_key(diff: float) -> float:
+    """A representative difference with the same ``timeago`` label.
+
+    Every bucket bound and rounding half-point is a whole number of seconds,
+    so the label is constant between consecutive integers. Whole differences
+    are their own key; any other maps to the midpoint of its interval.
+    """
+    return diff if diff.is_integer() else math.floor(diff) + 0.5
+
+
+def _cache_names(functions: tuple) -> tuple:
+    names = functions or CACHEABLE_FUNCTIONS
+    unknown = [name for name in names if name not in CACHEABLE_FUNCTIONS]
+    if unknown:
+        raise ValueError(f"Cannot cache: {', '.join(unknown)}")
+    return names
+
+
+def enable_cache(*functions: str, maxsize: int = 4096, ttl: Optional[float] = None,
+                 clock=time.monotonic) -> None:
+    """Cache results of the named public functions (all five by default).
+
+    Each function gets its own cache of at most ``maxsize`` entries, evicted
+    least recently used first. With ``ttl`` (seconds), entries also expire
+    that long after being stored and are evicted oldest first. Calling
+    again for a function replaces its cache. Results are identical to the
+    uncached functions, and invalid inputs still raise and are not cached.
+
+    Keys are normalized so that equivalent inputs share an entry:
+    ``timeago`` keys on the reference-minus-timestamp difference, the date
+    functions on whole seconds and timezone, ``duration`` on the seconds and
+    effective options, and ``parse_duration`` on the stripped, lower-cased
+    string (inputs over 64 characters are never cached).
+
+    Examples:
+        >>> enable_cache('timeago', maxsize=100)
+        >>> timeago(130, 200), timeago(1130, 1200)
+        ('1 minute ago', '1 minute ago')
+        >>> cache_info()['timeago'][:2]
+        (1, 1)
+        >>> disable_cache()
+    """
+    if not isinstance(maxsize, int) or maxsize < 1:
+        raise ValueError("maxsize must be a positive integer")
+    if ttl is not None and not ttl > 0:
+        raise ValueError("ttl must be positive")
+    for name in _cache_names(functions):
+        _CACHES[name] = _ResultCache(maxsize, ttl, clock)
+
+
+def disable_cache(*functions: str) -> None:
+    """Stop caching the named functions (all by default) and drop their entries."""
+    for name in _cache_names(functions):
+        _CACHES.pop(name, None)
+
+
+def cache_info() -> Dict[str, CacheInfo]:
+    """Hit and miss counters and sizes for every function with caching enabled."""
+    return {name: cache.info() for name, cache in _CACHES.items()}
+
+
+def cache_clear(*functions: str) -> None:
+    """Empty the named caches (all by default) and reset their counters."""
+    for name in _cache_names(functions):
+        cache = _CACHES.get(name)
+        if cache is not None:
+            cache.clear()
+
+
+# =============================================================================
+# Exportable rule tables
+# =============================================================================
+
+RULES_FORMAT_VERSION = 1
+
+_RULES_MAGIC = b'WWRT'
+
+
+def _rules_dict() -> Dict[str, Any]:
+    """The timeago and duration rules as plain data, from the module tables."""
+    return {
+        'version': RULES_FORMAT_VERSION,
+        'timeago': {
+            # Exclusive upper bounds of |reference - timestamp|, per bucket
+            'thresholds': list(_TIMEAGO_THRESHOLDS),
+            # Per bucket (one more than thresholds): unit and divisor. A
+            # divisor of 0 means a count of 1; otherwise the count is
+            # |diff| / divisor rounded half to even.
+            'buckets': [[unit, divisor] for unit, divisor in _TIMEAGO_RULES],
+            'now': "just now",
+            'past': "{n} {unit} ago",
+            'future': "in {n} {unit}",
+            'plural': "s",
+        },
+        'duration': {
+            # Largest first: name, compact abbreviation, seconds
+            'units': [[name, abbr, seconds] for name, abbr, seconds in _DURATION_UNITS],
+            'max_units': _DURATION_MAX_UNITS,
+            'zero': ["0 seconds", "0s"],
+            'separator': [", ", " "],
+            'plural': "s",
+        },
+    }
+
+
+def _pack_str(text: str) -> bytes:
+    data = text.encode('utf-8')
+    return struct.pack('<B', len(data)) + data
+
+
+def export_rules(format: str = 'json') -> Union[str, bytes]:
+    """Export the ``timeago`` and ``duration`` rules as a compact table.
+
+    Clients that render relative times themselves can load the table and
+    apply it exactly as ``RuleTable`` does; see usage.md for the algorithm.
+
+    Args:
+        format: 'json' for a JSON string, or 'binary' for a packed form
+            (little-endian; counts are u8, numbers u32, strings a u8 byte
+            length followed by UTF-8)
+
+    Returns:
+        The table as a str (JSON) or bytes (binary)
+
+    Examples:
+        >>> load_rules(export_rules()).timeago(1704049200, 1704067200)
+        '5 hours ago'
+    """
+    rules = _rules_dict()
+    if format == 'json':
+        return json.dumps(rules, separators=(',', ':'), ensure_ascii=False)
+    if format != 'binary':
+        raise ValueError(f"Unknown rules format: {format}")
+
+    t, d = rules['timeago'], rules['duration']
+    out = [_RULES_MAGIC, struct.pack('<B', rules['version'])]
+    out.append(struct.pack(f"<B{len(t['thresholds'])}I", len(t['thresholds']), *t['thresholds']))
+    out.append(struct.pack('<B', len(t['buckets'])))
+    for unit, divisor in t['buckets']:
+        out += [_pack_str(unit), struct.pack('<I', divisor)]
+    out += [_pack_str(t[key]) for key in ('now', 'past', 'future', 'plural')]
+    out.append(struct.pack('<B', len(d['units'])))
+    for name, abbr, seconds in d['units']:
+        out += [_pack_str(name), _pack_str(abbr), struct.pack('<I', seconds)]
+    out.append(struct.pack('<B', d['max_units']))
+    out += [_pack_str(text) for text in d['zero'] + d['separator'] + [d['plural']]]
+    return b''.join(out)
+
+
+def _unpack_rules(data: bytes) -> Dict[str, Any]:
+    """Decode the binary form of ``export_rules``."""
+    if data[:4] != _RULES_MAGIC:
+        raise ValueError("Not a whenwords rules table")
+    offset = 4
+
+    def take(fmt: str) -> tuple:
+        nonlocal offset
+        values = struct.unpack_from(fmt, data, offset)
+        offset += struct.calcsize(fmt)
+        return values
+
+    def take_str() -> str:
+        nonlocal offset
+        (length,) = take('<B')
+        text = data[offset:offset + length].decode('utf-8')
+        offset += length
+        return text
+
+    (version,) = take('<B')
+    (count,) = take('<B')
+    thresholds = list(take(f'<{count}I'))
+    (count,) = take('<B')
+    buckets = [[take_str(), take('<I')[0]] for _ in range(count)]
+    now, past, future, plural = (take_str() for _ in range(4))
+    (count,) = take('<B')
+    units = [[take_str(), take_str(), take('<I')[0]] for _ in range(count)]
+    (max_units,) = take('<B')
+    zero = [take_str(), take_str()]
+    separator = [take_str(), take_str()]
+    return {
+        'version': version,
+        'timeago': {'thresholds': thresholds, 'buckets': buckets, 'now': now,
+                    'past': past, 'future': future, 'plural': plural},
+        'duration': {'units': units, 'max_units': max_units, 'zero': zero,
+                     'separator': separator, 'plural': take_str()},
+    }
+
+
+class RuleTable:
+    """Evaluates ``timeago`` and ``duration`` from an exported rule table.
+
+    Uses nothing but the table, so it is the reference for client ports:
+    for any table from ``export_rules`` it returns exactly what the module
+    functions return.
+    """
+
+    def __init__(self, rules: Dict[str, Any]):
+        if rules.get('version') != RULES_FORMAT_VERSION:
+            raise ValueError(f"Unsupported rules version: {rules.get('version')}")
+        self.rules = rules
+        timeago_rules = rules['timeago']
+        self._thresholds = timeago_rules['thresholds']
+        self._buckets = timeago_rules['buckets']
+
+    def timeago(self, timestamp: Union[int, float, str, datetime],
+                reference: Optional[Union[int, float, str, datetime]] = None) -> str:
+        """``timeago(timestamp, reference)`` from the table."""
+        ts = _to_timestamp(timestamp)
+        ref = _to_timestamp(reference) if reference is not None else ts
+        rules = self.rules['timeago']
+        diff = ref - ts
+        abs_diff = abs(diff)
+
+        # The first bucket whose bound exceeds |diff|
+        bucket = bisect_right(self._thresholds, abs_diff)
+        if bucket == 0:
+            return rules['now']
+        unit, divisor = self._buckets[bucket]
+        n = round(abs_diff / divisor) if divisor else 1
+        if n != 1:
+            unit += rules['plural']
+        return (rules['future'] if diff < 0 else rules['past']).format(n=n, unit=unit)
+
+    def duration(self, seconds: Union[int, float],
+                 options: Optional[Dict[str, Any]] = None) -> str:
+        """``duration(seconds, options)`` from the table."""
+        if seconds < 0 or math.isnan(seconds) or math.isinf(seconds):
+            raise ValueError("Duration must be non-negative and finite")
+        rules = self.rules['duration']
+        options = options or {}
+        compact = 1 if options.get('compact', False) else 0
+        max_units = options.get('max_units', rules['max_units'])
+        if seconds == 0:
+            return rules['zero'][compact]
+
+        # Greedy from the largest unit; the last unit shown is rounded
+        # (half up) and stops the walk. Whole seconds are divided exactly.
+        whole = isinstance(seconds, int) or (isinstance(seconds, float) and seconds.is_integer())
+        parts = []
+        remaining = int(seconds) if whole else seconds
+        for name, abbr, unit_seconds in rules['units']:
+            if remaining < unit_seconds:
+                continue
+            if whole:
+                count, remaining = divmod(remaining, unit_seconds)
+            else:
+                count = int(remaining / unit_seconds)
+                remaining = remaining % unit_seconds
+            last = len(parts) + 1 >= max_units
+            if last and 2 * remaining >= unit_seconds:
+                count += 1
+            if compact:
+                parts.append(f"{count}{abbr}")
+            else:
+                parts.append(f"{count} {name if count == 1 else name + rules['plural']}")
+            if last:
+                break
+        return rules['separator'][compact].join(parts)
+
+
+def load_rules(data: Union[str, bytes]) -> RuleTable:
+    """Load a table from ``export_rules`` (JSON str or binary bytes)."""
+    if isinstance(data, (bytes, bytearray)):
+        return RuleTable(_unpack_rules(bytes(data)))
+    return RuleTable(json.loads(data))
+
+
+# =============================================================================
+# On-disk snapshots of offset tables
+# =============================================================================
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+_SNAPSHOT_MAGIC = b'WWSN'
+
+
+def _tzdata_version() -> str:
+    """The IANA release of the tzdata zoneinfo reads, or '' if unknown."""
+    # zoneinfo searches TZPATH first and falls back to the tzdata package
+    for root in zoneinfo.TZPATH:
+        try:
+            with open(os.path.join(root, 'tzdata.zi'), encoding='utf-8') as f:
+                first = f.readline()
+        except OSError:
+            continue
+        if first.startswith('# version '):
+            return first[len('# version '):].strip()
+    try:
+        import tzdata
+    except ImportError:
+        return ''
+    return getattr(tzdata, 'IANA_VERSION', '')
+
+
+def _snapshot_header() -> bytes:
+    """What a snapshot must start with to be valid for this process."""
+    return b''.join([_SNAPSHOT_MAGIC,
+                     struct.pack('<BB', SNAPSHOT_FORMAT_VERSION, sys.byteorder == 'little'),
+                     _pack_str(__version__), _pack_str(_tzdata_version())])
+
+
+def save_snapshot(path: str, timezones: Iterable[str],
+                  start: Union[int, float, str, datetime],
+                  end: Union[int, float, str, datetime]) -> None:
+    """Build offset tables for ``timezones`` over ``[start, end]`` into a file.
+
+    The file records the library and tzdata versions it was built with;
+    ``load_snapshot`` ignores it once either changes. It is written to a
+    temporary name and renamed into place, so processes that are loading
+    it concurrently see either the old file or the new one.
+
+    Layout: the header (magic, format, byte order, both versions as u8
+    length-prefixed UTF-8), a u32 zone count, then per zone its name, lo
+    and hi (i64) and transition count (u32). Then, per zone, its starts
+    (native i64, padded to an 8-byte boundary) and offsets (native i32).
+    """
+    lo = _whole_seconds(_to_timestamp(start))
+    hi = _whole_seconds(_to_timestamp(end))
+    lo, hi = min(lo, hi), max(lo, hi)
+    tables = {name: _OffsetTable.build(_resolve_tz(name), lo, hi)
+              for name in dict.fromkeys(timezones)}
+
+    data = bytearray(_snapshot_header())
+    data += struct.pack('<I', len(tables))
+    for name, table in tables.items():
+        data += _pack_str(name) + struct.pack('<qqI', table.lo, table.hi, len(table.starts))
+    for table in tables.values():
+        data += bytes(-len(data) % 8)
+        data += array('q', table.starts).tobytes() + array('i', table.offsets).tobytes()
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def _map_snapshot(path: str) -> Optional[Dict[str, _OffsetTable]]:
+    """Read a snapshot through a read-only mapping.
+
+    Returns None if it is missing, stale or malformed. The pages come
+    straight from the shared page cache, and each table is copied out in
+    one ``tolist()``: bisecting a list is faster than bisecting a view.
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    with mapped:
+        header = _snapshot_header()
+        if mapped[:len(header)] != header:
+            return None
+        try:
+            offset = len(header)
+            (count,) = struct.unpack_from('<I', mapped, offset)
+            offset += 4
+            zones = []
+            for _ in range(count):
+                (length,) = struct.unpack_from('<B', mapped, offset)
+                name = mapped[offset + 1:offset + 1 + length].decode('utf-8')
+                offset += 1 + length
+                zones.append((name, _resolve_tz(name))
+                             + struct.unpack_from('<qqI', mapped, offset))
+                offset += 20
+        except (ValueError, struct.error):
+            return None
+        tables = {}
+        with memoryview(mapped) as view:
+            for name, tz, lo, hi, n in zones:
+                offset += -offset % 8
+                if offset + 12 * n > len(mapped):
+                    return None
+                with view[offset:offset + 8 * n].cast('q') as starts, \
+                        view[offset + 8 * n:offset + 12 * n].cast('i') as offsets:
+                    tables[name] = _OffsetTable(starts.tolist(), offsets.tolist(),
+                                                 lo, hi, tz)
+                offset += 12 * n
+        return tables
+
+
+def _install_tables(tables: Dict[str, _OffsetTable]) -> None:
+    for name, table in tables.items():
+        current = _OFFSET_TABLES.get(name)
+        # Keep a table built in this process if it already covers more
+        if current is None or table.covers(current.lo, current.hi):
+            _OFFSET_TABLES[name] = table
+
+
+def load_snapshot(path: str) -> bool:
+    """Use the offset tables in a snapshot from ``save_snapshot``.
+
+    Returns False, and changes nothing, if the file is missing, malformed,
+    or was built by another library version or against other tzdata.
+    Batches that need a zone or span the snapshot lacks build it as usual.
+    """
+    tables = _map_snapshot(path)
+    if tables is None:
+        return False
+    _install_tables(tables)
+    return True
+
+
+def warm_start(path: str, timezones: Iterable[str],
+               start: Union[int, float, str, datetime],
+               end: Union[int, float, str, datetime]) -> bool:
+    """Load the snapshot at ``path``, rebuilding it first if it won't do.
+
+    A snapshot is rebuilt when it is missing or stale, or lacks one of
+    ``timezones`` over ``[start, end]``. Call this at worker start-up.
+
+    Returns:
+        True if the existing snapshot was used, False if it was rebuilt
+    """
+    timezones = list(timezones)
+    lo = _whole_seconds(_to_timestamp(start))
+    hi = _whole_seconds(_to_timestamp(end))
+    lo, hi = min(lo, hi), max(lo, hi)
+    tables = _map_snapshot(path)
+    reused = tables is not None and all(
+        name in tables and tables[name].covers(lo, hi) for name in timezones)
+    if not reused:
+        save_snapshot(path, timezones, lo, hi)
+        tables = _map_snapshot(path)
+        if tables is None:
+            raise ValueError(f"Could not read back snapshot: {path}")
+    _install_tables(tables)
+    return reused
+
+
+# =============================================================================
+# Sessionizing event streams
+# =============================================================================
+
+class Session(NamedTuple):
+    """A closed session: one key's events with no gap longer than allowed."""
+    key: Any
+    start: float
+    end: float
+    events: int
+    length: str  # duration(end - start)
+    span: str    # date_range(start, end)
+
+
+def sessionize(events: Iterable[tuple],
+               gap: Union[str, int, float],
+               timezone: Optional[str] = None,
+               duration_options: Optional[Dict[str, Any]] = None):
+    """Group a time-ordered stream of keyed events into sessions.
+
+    A key's session closes once more than ``gap`` seconds pass without an
+    event for it. It is yielded as soon as the stream reaches that point,
+    without waiting for the key's next event. Each open session holds only
+    its start, end and event count, however many events it spans.
+
+    Args:
+        events: Iterable of ``(key, timestamp)`` pairs in time order. Keys
+                are any hashable values, e.g. user IDs.
+        gap: Longest inactivity within a session, as seconds or a
+             ``parse_duration`` string such as "30m"
+        timezone: IANA timezone name for ``span``. If None, uses UTC.
+        duration_options: Options passed to ``duration`` for ``length``
+
+    Yields:
+        ``Session`` tuples in the order they close. Sessions still open at
+        the end of the stream follow, oldest last event first.
+
+    Examples:
+        >>> events = [('ann', 1704067200), ('bob', 1704067500),
+        ...           ('ann', 1704068100), ('ann', 1704078000)]
+        >>> for s in sessionize(events, "30m"):
+        ...     print(s.key, s.events, s.length, '|', s.span)
+        bob 1 0 seconds | January 1, 2024
+        ann 2 15 minutes | January 1, 2024
+        ann 1 0 seconds | January 1, 2024
+    """
+    gap_seconds = parse_duration(gap) if isinstance(gap, str) else gap
+    if not gap_seconds >= 0 or math.isinf(gap_seconds):
+        raise ValueError("Session gap must be non-negative and finite")
+    _resolve_tz(timezone)
+
+    def closed(key: Any, state: list) -> Session:
+        start, end, count = state
+        return Session(key, start, end, count, duration(end - start, duration_options),
+                       date_range(start, end, timezone=timezone))
+
+    # Open sessions as [start, end, events], least recently active first
+    sessions: 'OrderedDict[Any, list]' = OrderedDict()
+    latest = -math.inf
+    for key, timestamp in events:
+        ts = _to_timestamp(timestamp)
+        if ts < latest:
+            raise ValueError(f"Events out of time order: {timestamp} after {latest}")
+        latest = ts
+
+        while sessions:
+            state = next(iter(sessions.values()))
+            if ts - state[1] <= gap_seconds:
+                break
+            yield closed(*sessions.popitem(last=False))
+
+        state = sessions.get(key)
+        if state is None:
+            sessions[key] = [ts, ts, 1]
+        else:
+            state[1] = ts
+            state[2] += 1
+            sessions.move_to_end(key)
+
+    while sessions:
+        yield closed(*sessions.popitem(last=False))
+
+
+# =============================================================================
+# Last-seen index
+# =============================================================================
+
+# Marks a slot whose key has never been seen
+_NEVER_SEEN = -(2 ** 63)
+
+# Default bound on int keys: the array grows to the largest key, so a
+# stray 64-bit ID must not try to allocate terabytes (2**28 slots is 2 GB)
+_LAST_SEEN_MAX_KEY = 2 ** 28 - 1
+
+
+class LastSeenIndex:
+    """The latest time each key was seen, in one flat int64 array.
+
+    Keys are non-negative ints up to ``max_key``, used directly as array
+    slots, so dense IDs cost 8 bytes each. With ``interned=True`` keys are
+    any hashable values (usually strings or sparse IDs), each given the
+    next free slot when first seen; those cost a dict entry as well. Times
+    are kept as whole Unix seconds and must fit in int64.
+
+    Examples:
+        >>> index = LastSeenIndex(interned=True)
+        >>> index.update('ann', 1704049200)
+        >>> index.update('bob', 1704067140)
+        >>> index.timeago(['ann', 'bob', 'cyd'], 1704067200)
+        ['5 hours ago', '1 minute ago', None]
+    """
+
+    __slots__ = ('_times', '_slots', '_count', 'max_key')
+
+    def __init__(self, interned: bool = False, max_key: int = _LAST_SEEN_MAX_KEY):
+        self._times = array('q')
+        self._slots: Optional[Dict[Any, int]] = {} if interned else None
+        self._count = 0
+        self.max_key = max_key
+
+    def __len__(self) -> int:
+        """Number of keys seen at least once."""
+        return self._count
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key) is not None
+
+    def _slot(self, key: Any) -> int:
+        """The slot of ``key``, or -1 if it has none."""
+        if self._slots is not None:
+            return self._slots.get(key, -1)
+        return key if type(key) is int and 0 <= key < len(self._times) else -1
+
+    def update(self, key: Any, timestamp: Union[int, float, str, datetime]) -> None:
+        """Record that ``key`` was seen at ``timestamp``.
+
+        Keeps the later of the stored and the new time, so events may
+        arrive out of order. Invalid keys and times raise ValueError
+        before anything is stored.
+        """
+        try:
+            seconds = (timestamp if type(timestamp) is int
+                       else _whole_seconds(_to_timestamp(timestamp)))
+        except OverflowError:
+            raise ValueError(f"Timestamp out of range: {timestamp!r}") from None
+        if not _NEVER_SEEN < seconds < 2 ** 63:
+            raise ValueError(f"Timestamp out of range: {timestamp!r}")
+        times = self._times
+        if self._slots is not None:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = len(times)
+                times.append(_NEVER_SEEN)
+        else:
+            if type(key) is not int or key < 0:
+                raise ValueError(f"Keys must be non-negative ints (or use interned=True): {key!r}")
+            if key > self.max_key:
+                raise ValueError(f"Key {key} exceeds max_key {self.max_key}; "
+                                 f"use interned=True for sparse IDs")
+            slot = key
+            if slot >= len(times):
+                times.extend(repeat(_NEVER_SEEN, slot + 1 - len(times)))
+        stored = times[slot]
+        if stored == _NEVER_SEEN:
+            self._count += 1
+        if seconds > stored:
+            times[slot] = seconds
+
+    def get(self, key: Any) -> Optional[int]:
+        """When ``key`` was last seen, in Unix seconds, or None."""
+        slot = self._slot(key)
+        if slot < 0:
+            return None
+        seconds = self._times[slot]
+        return None if seconds == _NEVER_SEEN else seconds
+
+    def _gather(self, keys: Iterable[Any]) -> List[Optional[int]]:
+        return [self.get(key) for key in keys]
+
+    def timeago(self, keys: Iterable[Any],
+                reference: Union[int, float, str, datetime]) -> List[Optional[str]]:
+        """``timeago`` of each key's last-seen time; None for unseen keys."""
+        times = self._gather(keys)
+        labels = iter(timeago_many([t for t in times if t is not None], reference))
+        return [None if t is None else next(labels) for t in times]
+
+    def human_date(self, keys: Iterable[Any],
+                   reference: Union[int, float, str, datetime],
+                   timezone: Optional[str] = None) -> List[Optional[str]]:
+        """``human_date`` of each key's last-seen time; None for unseen keys."""
+        times = self._gather(keys)
+        labels = iter(human_date_many([t for t in times if t is not None], reference, timezone))
+        return [None if t is None else next(labels) for t in times]
+
+    def timeago_counts(self, reference: Union[int, float, str, datetime],
+                       keys: Optional[Iterable[Any]] = None) -> Dict[TimeagoParts, int]:
+        """How many keys fall under each ``timeago`` label, without formatting any.
+
+        Counts every seen key, or only ``keys`` (unseen ones are skipped).
+        Labels are given as the ``TimeagoParts`` that ``timeago_parts``
+        returns for them, except that "just now" is always counted once,
+        with ``is_future=False``. Past labels come first, most recent
+        first, then future ones, nearest first.
+
+        Examples:
+            >>> index = LastSeenIndex()
+            >>> for key, seconds in enumerate([1704049200, 1704049300, 1704067140]):
+            ...     index.update(key, seconds)
+            >>> index.timeago_counts(1704067200)
+            {TimeagoParts(n=1, unit='minute', is_future=False): 1, TimeagoParts(n=5, unit='hour', is_future=False): 2}
+        """
+        ref = _to_timestamp(reference)
+        if keys is None:
+            times = self._times
+            if np is not None:
+                seen = np.frombuffer(times, dtype=np.int64)
+                return _timeago_counts_array(seen[seen != _NEVER_SEEN], ref)
+            times = (t for t in times if t != _NEVER_SEEN)
+        else:
+            times = array('q', (t for t in self._gather(keys) if t is not None))
+            if np is not None:
+                return _timeago_counts_array(np.frombuffer(times, dtype=np.int64), ref)
+
+        # Keys seen at the same second share a label, so count differences first
+        counts: Dict[TimeagoParts, int] = {}
+        for diff, count in Counter(map(sub, repeat(ref), times)).items():
+            bucket, n = _timeago_count(diff)
+            # "just now" is one label whichever side of the reference
+            parts = TimeagoParts(n, _TIMEAGO_RULES[bucket][0], bucket > 0 and diff < 0)
+            counts[parts] = counts.get(parts, 0) + count
+        return _ordered_counts(counts)
+
+
+def _ordered_counts(counts: Dict[TimeagoParts, int]) -> Dict[TimeagoParts, int]:
+    return {parts: counts[parts] for parts in sorted(
+        counts, key=lambda p: (p.is_future, _TIMEAGO_UNIT_INDEX[p.unit], p.n))}
+
+
+def _timeago_counts_array(times, ref: float) -> Dict[TimeagoParts, int]:
+    """``LastSeenIndex.timeago_counts`` over an int64 array, with NumPy."""
+    diff = ref - times.astype(np.float64)
+    abs_diff = np.abs(diff)
+    bucket = np.searchsorted(np.array(_TIMEAGO_THRESHOLDS, dtype=np.float64), abs_diff,
+                             side='right')
+    divisor = np.array([d or 1 for _, d in _TIMEAGO_RULES], dtype=np.float64)[bucket]
+    # rint rounds half to even, like round()
+    n = np.rint(abs_diff / divisor).astype(np.int64)
+    n[np.array([bool(d) for _, d in _TIMEAGO_RULES])[bucket] == 0] = 1
+    n[bucket == 0] = 0
+
+    # One code per (n, bucket, direction), counted without any strings
+    codes = (n * len(_TIMEAGO_RULES) + bucket) * 2 + ((diff < 0) & (bucket > 0))
+    if codes.size and codes.max() < 1 << 22:
+        tally = np.bincount(codes)
+        present = np.flatnonzero(tally)
+        counts = tally[present]
+    else:
+        present, counts = np.unique(codes, return_counts=True)
+    result = {}
+    for code, count in zip(present.tolist(), counts.tolist()):
+        code, future = divmod(code, 2)
+        n, bucket = divmod(code, len(_TIMEAGO_RULES))
+        result[TimeagoParts(n, _TIMEAGO_RULES[bucket][0], bool(future))] = count
+    return _ordered_counts(result)